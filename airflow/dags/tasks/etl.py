@@ -1,9 +1,9 @@
 # Importing the necessary modules
 # --------------------------------
 
-from extract.api_extract import extract_musicbrainz
+from extract.api_extract import extract_musicbrainz, unir_shards, SHARDS as API_SHARDS
 from extract.spotify_extract import extracting_spotify_data
-from extract.grammys_extract import extracting_grammys_data
+from extract.grammys_extract import extracting_grammys_data, fingerprinting_grammys_table
 
 from transform.api_transform import transform_artist_data
 from transform.spotify_transform import transforming_spotify_data
@@ -12,101 +12,108 @@ from transform.merge import merging_datasets
 
 from load_store.load import loading_merged_data
 from load_store.store import storing_merged_data
+from load_store.artifacts import saving_artifact, reading_artifact, removing_artifact
+from load_store.stage_cache import memoizing, fingerprinting, fingerprinting_file, code_version
 
-import os
-import json
-import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', datefmt='%m/%d/%Y %I:%M:%S %p')
 
+SPOTIFY_PATH = "./data/spotify_dataset.csv"
 
-def extract_api():
+
+def stage_key(refs, *functions):
+    """
+    Fingerprint of a stage: the fingerprints of its input artifacts `refs` plus the
+    version of the code of `functions` and of the project modules they import.
+    None (nothing reused) if any input has no fingerprint.
+
+    """
+    fingerprints = [ref.get("fingerprint") if ref else None for ref in refs]
+    if None in fingerprints:
+        return None
+    return fingerprinting(fingerprints, code_version(*functions))
+
+
+def extract_api(shard=None, shards=None):
     try:
-        df = extract_musicbrainz()
-        return df.to_json(orient="records")
+        if shard is None:
+            # The API is a live source, so it is always queried; the output is cached under its content fingerprint.
+            return memoizing("api_raw", None, extract_musicbrainz)
+        df = extract_musicbrainz(shard=shard, shards=shards)
+        return saving_artifact(df, f"api_raw_shard_{shard}")
     except Exception as e:
         logging.error(f"Error extracting data: {e}")
+        # Failing the task lets Airflow retry it, and the retry resumes from the checkpoint.
+        raise
+
+def combine_api(refs):
+    try:
+        # The refs arrive in shard order, so the combined output does not depend on which shard finished first.
+        combined = memoizing("api_raw", None, lambda: unir_shards([reading_artifact(ref) for ref in refs]))
+        # The shard outputs are only read here, so they are removed once combined.
+        for ref in refs:
+            removing_artifact(ref)
+        return combined
+    except Exception as e:
+        logging.error(f"Error combining data: {e}")
 
 def extract_spotify():
     try:
-        df = extracting_spotify_data("./data/spotify_dataset.csv") 
-        return df.to_json(orient="records")
+        key = fingerprinting(fingerprinting_file(SPOTIFY_PATH), code_version(extracting_spotify_data))
+        return memoizing("spotify_raw", key, lambda: extracting_spotify_data(SPOTIFY_PATH))
     except Exception as e:
         logging.error(f"Error extracting data: {e}")
 
 def extract_grammys():
     try:
-        df = extracting_grammys_data()
-        return df.to_json(orient="records")
+        table = fingerprinting_grammys_table()
+        key = fingerprinting(table, code_version(extracting_grammys_data)) if table else None
+        return memoizing("grammys_raw", key, extracting_grammys_data)
     except Exception as e:
         logging.error(f"Error extracting data: {e}")
         
-def transform_api(df):
+def transform_api(ref):
     try:
-        json_df = json.loads(df)
-        
-        raw_df = pd.DataFrame(json_df)
-        df = transform_artist_data(raw_df)
-        
-        return df.to_json(orient="records")
+        key = stage_key([ref], transform_artist_data)
+        return memoizing("api_clean", key, lambda: transform_artist_data(reading_artifact(ref)))
     except Exception as e:
         logging.error(f"Error transforming data: {e}")
         
-def transform_spotify(df):
+def transform_spotify(ref):
     try:
-        json_df = json.loads(df)
-        
-        raw_df = pd.DataFrame(json_df)
-        df = transforming_spotify_data(raw_df)
-        
-        return df.to_json(orient="records")
+        key = stage_key([ref], transforming_spotify_data)
+        return memoizing("spotify_clean", key, lambda: transforming_spotify_data(reading_artifact(ref)))
     except Exception as e:
         logging.error(f"Error transforming data: {e}")
         
-def transform_grammys(df):
+def transform_grammys(ref):
     try:
-        json_df = json.loads(df)
-        
-        raw_df = pd.DataFrame(json_df)
-        df = transforming_grammys_data(raw_df)
-        
-        return df.to_json(orient="records")
+        key = stage_key([ref], transforming_grammys_data)
+        return memoizing("grammys_clean", key, lambda: transforming_grammys_data(reading_artifact(ref)))
     except Exception as e:
         logging.error(f"Error transforming data: {e}")
         
-def merge_data(api_data, spotify_data, grammys_data):
+def merge_data(api_ref, spotify_ref, grammys_ref):
     try:
-        api_json = json.loads(api_data)
-        spotify_json = json.loads(spotify_data)
-        grammys_json = json.loads(grammys_data)
-        
-        api_df = pd.DataFrame(api_json)
-        spotify_df = pd.DataFrame(spotify_json)
-        grammys_df = pd.DataFrame(grammys_json)
-        
-        df = merging_datasets(api_df, spotify_df, grammys_df)
-        
-        return df.to_json(orient="records")
+        refs = [api_ref, spotify_ref, grammys_ref]
+        key = stage_key(refs, merging_datasets)
+        return memoizing("merged", key, lambda: merging_datasets(*[reading_artifact(ref) for ref in refs]))
     except Exception as e:
         logging.error(f"Error merging data: {e}")
         
-def load_data(df):
+def load_data(ref):
     try:
-        json_df = json.loads(df)
-        
-        df = pd.DataFrame(json_df)
+        df = reading_artifact(ref)
         loading_merged_data(df, "merged_data")
         
-        return df.to_json(orient="records")
+        return ref
     except Exception as e:
         logging.error(f"Error loading data: {e}")
         
-def store_data(df):
+def store_data(ref):
     try:
-        json_df = json.loads(df)
-        
-        df = pd.DataFrame(json_df)
+        df = reading_artifact(ref)
         storing_merged_data("merged_data", df)
     except Exception as e:
         logging.error(f"Error storing data: {e}")
\ No newline at end of file
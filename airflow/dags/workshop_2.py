@@ -34,10 +34,15 @@ def workshop_2_dag():
     """
     
     @task
-    def api_extraction():
-        return extract_api()
+    def api_extraction(shard):
+        return extract_api(shard, API_SHARDS)
     
-    api_raw_data = api_extraction()
+    @task
+    def api_combination(refs):
+        return combine_api(refs)
+    
+    # One mapped task per shard of the artist list (MUSICBRAINZ_SHARDS); all of them share one rate limit.
+    api_raw_data = api_combination(api_extraction.expand(shard=list(range(API_SHARDS))))
     
     @task 
     def spotify_extraction():
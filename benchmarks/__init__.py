@@ -0,0 +1,4 @@
+"""
+Benchmarks of the ETL stages on synthetic data (see benchmarks/suite.py).
+
+"""
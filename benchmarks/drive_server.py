@@ -0,0 +1,192 @@
+"""
+Local stand-in for the Google Drive v2 files API used by src/load_store/store.py.
+
+Serves files.list (title and parent queries), files.get, and resumable
+files.insert/files.update uploads sent in chunks, keeping every file in memory
+with its md5Checksum, fileSize and revision count. A share of the upload chunks
+can be answered with 503, so the chunk retries of the export can be exercised
+without network access or credentials.
+
+Usage:
+    with DriveStandIn(FaultInjection(error_rate=0.2)) as server:
+        store._drive = server.connecting()
+        store.storing_merged_data("merged_data", df)
+        server.files
+
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import threading
+import hashlib
+import json
+import uuid
+import re
+
+from benchmarks.musicbrainz_server import FaultInjection
+
+title_pattern = re.compile(r"title = '((?:[^'\\]|\\.)*)'")
+parent_pattern = re.compile(r"'([^']+)' in parents")
+range_pattern = re.compile(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)")
+
+
+class DriveStandIn:
+    """
+    The fake Drive v2 files API on a background thread.
+
+    Only the upload chunks go through `faults`; listing and session creation always answer.
+
+    """
+
+    def __init__(self, faults=None, host="127.0.0.1", port=0):
+        self.faults = faults or FaultInjection()
+        self.files = {}
+        self.sessions = {}
+        self.chunks = {"ok": 0, "error": 0}
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def connecting(self):
+        """
+        A pydrive2 GoogleDrive whose API client talks to this server, with a dummy token.
+
+        """
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.discovery_cache import get_static_doc
+        from oauth2client.client import AccessTokenCredentials
+        from pydrive2.auth import GoogleAuth
+        from pydrive2.drive import GoogleDrive
+
+        document = json.loads(get_static_doc("drive", "v2"))
+        document["rootUrl"] = self.url
+        gauth = GoogleAuth()
+        gauth.credentials = AccessTokenCredentials("stand-in", "drive-stand-in")
+        gauth.http = gauth.credentials.authorize(gauth._build_http())
+        gauth.service = build_from_document(document, http=gauth.http)
+        return GoogleDrive(gauth)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _metadata(self, file):
+        return {key: value for key, value in file.items() if key != "content"}
+
+    def _committing(self, session):
+        content = bytes(session["content"])
+        with self.lock:
+            file = self.files.get(session["file_id"])
+            if file is None:
+                file = {"kind": "drive#file", "id": session["file_id"], "revisions": 0, **session["metadata"]}
+                self.files[file["id"]] = file
+            file.update(content=content, fileSize=str(len(content)), md5Checksum=hashlib.md5(content).hexdigest())
+            file["revisions"] += 1
+            return self._metadata(file)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _sending(self, status, body=None, headers=None):
+                payload = json.dumps(body).encode("utf-8") if body is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _reading(self):
+                return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = url.path.strip("/").split("/")
+                if parts[-1] == "files":
+                    query = parse_qs(url.query).get("q", [""])[0]
+                    title, parent = title_pattern.search(query), parent_pattern.search(query)
+                    with server.lock:
+                        items = [server._metadata(file) for file in server.files.values()
+                                 if (title is None or file.get("title") == title.group(1).replace("\\'", "'"))
+                                 and (parent is None or parent.group(1) in [p.get("id") for p in file.get("parents", [])])]
+                    return self._sending(200, {"kind": "drive#fileList", "items": items})
+                with server.lock:
+                    file = server.files.get(parts[-1])
+                    if file is None:
+                        return self._sending(404, {"error": {"code": 404, "message": "File not found."}})
+                    return self._sending(200, server._metadata(file))
+
+            def do_POST(self):
+                self._opening()
+
+            def do_PUT(self):
+                params = parse_qs(urlparse(self.path).query)
+                if "upload_id" in params:
+                    return self._receiving(params["upload_id"][0])
+                self._opening()
+
+            def _opening(self):
+                # First request of a resumable upload: metadata in, session URI out.
+                url = urlparse(self.path)
+                if "upload" not in url.path.split("/") or parse_qs(url.query).get("uploadType") != ["resumable"]:
+                    return self._sending(400, {"error": {"code": 400, "message": "Only resumable uploads are served."}})
+                body = self._reading()
+                parts = url.path.strip("/").split("/")
+                file_id = parts[-1] if parts[-1] != "files" else uuid.uuid4().hex
+                if parts[-1] != "files" and file_id not in server.files:
+                    return self._sending(404, {"error": {"code": 404, "message": "File not found."}})
+                session = uuid.uuid4().hex
+                with server.lock:
+                    server.sessions[session] = {"file_id": file_id, "metadata": json.loads(body or b"{}"), "content": bytearray()}
+                self._sending(200, headers={"Location": f"{server.url}upload/drive/v2/files?uploadType=resumable&upload_id={session}"})
+
+            def _receiving(self, session_id):
+                session = server.sessions.get(session_id)
+                body = self._reading()
+                if session is None:
+                    return self._sending(404, {"error": {"code": 404, "message": "Upload session not found."}})
+                match = range_pattern.match(self.headers.get("Content-Range", ""))
+                if match is None:
+                    return self._sending(400, {"error": {"code": 400, "message": "Missing Content-Range."}})
+                start, _, total = match.groups()
+
+                if start is not None:
+                    if server.faults.drawing() != "ok":
+                        with server.lock:
+                            server.chunks["error"] += 1
+                        return self._sending(503, {"error": {"code": 503, "message": "Backend Error"}})
+                    with server.lock:
+                        server.chunks["ok"] += 1
+                        # A chunk resent after a lost answer overwrites the bytes it already sent.
+                        del session["content"][int(start):]
+                        session["content"] += body
+
+                received = len(session["content"])
+                if total != "*" and received == int(total):
+                    del server.sessions[session_id]
+                    return self._sending(200, server._committing(session))
+                headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+                self._sending(308, headers=headers)
+
+        return Handler
@@ -0,0 +1,139 @@
+"""
+Load test of the MusicBrainz extractor against the local stand-in server.
+
+Starts benchmarks.musicbrainz_server with the requested faults, points the
+extractor at it and runs the online extraction (planner, OR-query batches,
+pagination, rate limiter, retries) over a list of artists drawn from the
+synthetic catalog plus a share of names it does not know. Reports the wall
+time, artists per second, the requests the server received by outcome, the
+requests the client made and how many of them were retries.
+
+Usage:
+    python -m benchmarks.extractor_load --artists 1000 --rps 20 --workers 4
+    python -m benchmarks.extractor_load --latency 0.05 --jitter 0.05 --error-rate 0.05 --rate-limit 15
+    python -m benchmarks.extractor_load --timeout-rate 0.02 --client-timeout 1 --hang-seconds 2
+    python -m benchmarks.extractor_load --cache --passes 2   # second pass answered from the cache
+
+"""
+from tempfile import TemporaryDirectory
+from pathlib import Path
+import argparse
+import logging
+import random
+import json
+import time
+import sys
+import os
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.generators import generating_pools, generating_musicbrainz
+from benchmarks.musicbrainz_server import MusicBrainzStandIn, FaultInjection
+
+
+def drawing_artists(catalog, pools, n, miss_rate, seed):
+    """
+    `n` distinct artist names: a (1 - miss_rate) share known to the catalog, the rest unknown.
+
+    """
+    rng = random.Random(seed)
+    known = sorted(set(catalog["artist"]))
+    unknown = sorted(set(pools["artists"]) - set(known))
+    n_missing = min(int(n * miss_rate), len(unknown))
+    n_known = min(n - n_missing, len(known))
+    return rng.sample(known, n_known) + rng.sample(unknown, n_missing)
+
+
+def running_load(args):
+    catalog = generating_musicbrainz(args.scale, args.seed)
+    artists = drawing_artists(catalog, generating_pools(args.scale, args.seed), args.artists, args.miss_rate, args.seed)
+    faults = FaultInjection(args.latency, args.jitter, args.error_rate, args.timeout_rate, args.hang_seconds,
+                            args.rate_limit, args.rate_limit_status, seed=args.seed)
+
+    with MusicBrainzStandIn(catalog, faults) as server, TemporaryDirectory() as tmp:
+        # The extractor reads its configuration at import, so the environment is set first.
+        # The rate limiter state goes to the temporary directory, not to the one of real extractions.
+        os.environ.update({
+            "MUSICBRAINZ_RATE_LIMIT_PATH": str(Path(tmp) / "rate_limit.bin"),
+            "MUSICBRAINZ_ENDPOINT": server.url,
+            "MUSICBRAINZ_REQUESTS_PER_SECOND": str(args.rps),
+            "MUSICBRAINZ_MAX_WORKERS": str(args.workers),
+            "MUSICBRAINZ_TIMEOUT": str(args.client_timeout),
+            "METRICS_DIR": "",
+        })
+        from extract import api_extract
+        from extract.musicbrainz_cache import MusicBrainzCache
+        from extract.query_planner import QueryPlanner
+        logging.getLogger().setLevel(args.log_level)
+
+        cache = MusicBrainzCache(Path(tmp) / "cache.sqlite") if args.cache else None
+        planner = QueryPlanner(Path(tmp) / "query_stats.json", api_extract.RESULTS_PER_PAGE,
+                               api_extract.BATCH_SIZE, api_extract.MAX_QUERY_LENGTH)
+
+        passes = []
+        for number in range(1, args.passes + 1):
+            server_before, client_before = server.stats(), api_extract._peticiones_http
+            start = time.perf_counter()
+            rows = api_extract._consultar_musicbrainz(artists, cache, None, planner)
+            wall = time.perf_counter() - start
+            served = {outcome: count - server_before.get(outcome, 0) for outcome, count in server.stats().items()}
+
+            resolved = {api_extract._clave_cache(row["artist"]) for row in rows}
+            client_requests = api_extract._peticiones_http - client_before
+            passes.append({
+                "pass": number,
+                "artists": len(artists),
+                "resolved": sum(1 for artist in artists if api_extract._clave_cache(artist) in resolved),
+                "rows": len(rows),
+                "wall_seconds": round(wall, 3),
+                "artists_per_second": round(len(artists) / wall, 1) if wall else None,
+                "client_requests": client_requests,
+                "retries": client_requests - served.get("ok", 0),
+                "server": served,
+            })
+
+        if cache is not None:
+            cache.close()
+
+    return {"config": vars(args), "passes": passes}
+
+
+def printing_report(report):
+    print(f"{'pass':>4} {'artists':>8} {'resolved':>9} {'rows':>7} {'wall s':>8} {'artists/s':>10} "
+          f"{'requests':>9} {'retries':>8}  server outcomes")
+    for p in report["passes"]:
+        outcomes = ", ".join(f"{k}={v}" for k, v in sorted(p["server"].items()) if k != "requests" and v)
+        print(f"{p['pass']:>4} {p['artists']:>8} {p['resolved']:>9} {p['rows']:>7} {p['wall_seconds']:>8.2f} "
+              f"{p['artists_per_second']:>10} {p['client_requests']:>9} {p['retries']:>8}  {outcomes or '-'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artists", type=int, default=500, help="Distinct artists to extract.")
+    parser.add_argument("--miss-rate", type=float, default=0.1, help="Share of artists unknown to the catalog.")
+    parser.add_argument("--scale", type=float, default=1, help="Size of the synthetic catalog.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rps", type=float, default=20.0, help="Client rate limit (MUSICBRAINZ_REQUESTS_PER_SECOND).")
+    parser.add_argument("--workers", type=int, default=4, help="Client threads (MUSICBRAINZ_MAX_WORKERS).")
+    parser.add_argument("--client-timeout", type=float, default=10.0, help="Client timeout (MUSICBRAINZ_TIMEOUT).")
+    parser.add_argument("--cache", action="store_true", help="Use a fresh response cache shared by the passes.")
+    parser.add_argument("--passes", type=int, default=1, help="Extractions run one after another.")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--hang-seconds", type=float, default=15.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Server requests per second before rate limiting.")
+    parser.add_argument("--rate-limit-status", type=int, default=503)
+    parser.add_argument("--log-level", default="WARNING", help="Level of the extractor logs during the run.")
+    parser.add_argument("--json", help="Also write the report to this file.")
+    args = parser.parse_args()
+
+    report = running_load(args)
+    printing_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Seedable generators of synthetic Spotify, Grammys and MusicBrainz data with the
+same columns as the real sources.
+
+Scale 1 matches the size of the current files (114,000 Spotify tracks, 4,810
+Grammys nominations and 1,250 MusicBrainz artist rows). Column distributions are
+calibrated on the published statistics of the real datasets. The three sources
+share name pools: some Grammys nominees are Spotify track names and MusicBrainz
+rows are Spotify artists, so the merge finds matches the way it does on real data.
+
+Usage:
+    python -m benchmarks.generators --scale 10 --seed 0 --out data/synthetic
+
+"""
+from pathlib import Path
+import argparse
+
+import numpy as np
+import pandas as pd
+
+SPOTIFY_ROWS = 114000
+GRAMMYS_ROWS = 4810
+MUSICBRAINZ_ROWS = 1250
+
+GENRES = [
+    "acoustic", "afrobeat", "alt-rock", "alternative", "ambient", "anime", "black-metal", "bluegrass",
+    "blues", "brazil", "breakbeat", "british", "cantopop", "chicago-house", "children", "chill",
+    "classical", "club", "comedy", "country", "dance", "dancehall", "death-metal", "deep-house",
+    "detroit-techno", "disco", "disney", "drum-and-bass", "dub", "dubstep", "edm", "electro",
+    "electronic", "emo", "folk", "forro", "french", "funk", "garage", "german", "gospel", "goth",
+    "grindcore", "groove", "grunge", "guitar", "happy", "hard-rock", "hardcore", "hardstyle",
+    "heavy-metal", "hip-hop", "honky-tonk", "house", "idm", "indian", "indie-pop", "indie",
+    "industrial", "iranian", "j-dance", "j-idol", "j-pop", "j-rock", "jazz", "k-pop", "kids",
+    "latin", "latino", "malay", "mandopop", "metal", "metalcore", "minimal-techno", "mpb",
+    "new-age", "opera", "pagode", "party", "piano", "pop-film", "pop", "power-pop",
+    "progressive-house", "psych-rock", "punk-rock", "punk", "r-n-b", "reggae", "reggaeton",
+    "rock-n-roll", "rock", "rockabilly", "romance", "sad", "salsa", "samba", "sertanejo",
+    "show-tunes", "singer-songwriter", "ska", "sleep", "songwriter", "soul", "spanish", "study",
+    "swedish", "synth-pop", "tango", "techno", "trance", "trip-hop", "turkish", "world-music",
+]
+
+SYLLABLES = [
+    "ka", "lo", "mi", "ra", "ven", "do", "sa", "tor", "li", "na", "be", "el", "on", "ri", "ta",
+    "mar", "zo", "ne", "ko", "jo", "an", "de", "la", "vi", "sol", "ar", "is", "um", "bri", "ce",
+    "lé", "mö", "ña", "ro", "fe", "gu", "ha", "ja", "ell", "ston", "wood", "ley", "son", "berg",
+]
+WORDS = [
+    "love", "night", "heart", "fire", "dream", "blue", "light", "rain", "dance", "home", "gold",
+    "summer", "river", "wild", "moon", "city", "time", "soul", "road", "star", "shadow", "ocean",
+]
+ROLES = [
+    "producer", "producers", "engineer/mixer", "engineers/mixers", "mastering engineer",
+    "composer", "conductor", "soloist", "soloists", "artist", "album notes writer", "art director",
+    "choir director", "video director", "video producer",
+]
+CATEGORIES = [
+    "Record Of The Year", "Album Of The Year", "Song Of The Year", "Best New Artist",
+    "Best Pop Solo Performance", "Best Pop Duo/Group Performance", "Best Rock Performance",
+    "Best Rock Album", "Best R&B Performance", "Best Rap Performance", "Best Rap Album",
+    "Best Country Solo Performance", "Best Country Album", "Best Jazz Instrumental Album",
+    "Best Latin Pop Album", "Best Dance Recording", "Best Music Video", "Best Music Film",
+    "Best Classical Vocal Performance", "Best Orchestral Performance", "Best Choral Performance",
+    "Best Opera Recording", "Best Chamber Music/Small Ensemble Performance",
+    "Best Engineered Album, Non-Classical", "Producer Of The Year, Non-Classical",
+    "Best Recording Package", "Best Album Notes", "Best Historical Album",
+]
+COUNTRIES = ["US", "GB", "CA", "JM", "FR", "DE", "AU", "IT", "SE", "JP", "KR", "BR", "MX", "ES", "IE"]
+COUNTRY_WEIGHTS = [0.68, 0.09, 0.03, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01]
+TYPES = ["Person", "Group", "Orchestra", "Choir", "Other", None]
+TYPE_WEIGHTS = [0.647, 0.308, 0.030, 0.005, 0.002, 0.008]
+
+
+def _words(rng, n, syllables=(2, 4)):
+    counts = rng.integers(syllables[0], syllables[1] + 1, n)
+    picks = rng.choice(SYLLABLES, counts.sum())
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+    return ["".join(picks[bounds[i]:bounds[i + 1]]).capitalize() for i in range(n)]
+
+
+def _artist_pool(rng, n):
+    # Mostly "First Last" persons, plus bands with "The", "&" and single-word names.
+    first, last = _words(rng, n, (2, 3)), _words(rng, n, (2, 3))
+    kind = rng.random(n)
+    names = np.empty(n, dtype=object)
+    for i in range(n):
+        if kind[i] < 0.55:
+            names[i] = f"{first[i]} {last[i]}"
+        elif kind[i] < 0.70:
+            names[i] = f"The {first[i]}{'s' if kind[i] < 0.65 else ''}"
+        elif kind[i] < 0.78:
+            names[i] = f"{first[i]} & {last[i]}"
+        else:
+            names[i] = first[i]
+    return names
+
+
+def _track_pool(rng, n):
+    length = rng.integers(1, 5, n)
+    picks = rng.choice(WORDS + _words(rng, 400), length.sum())
+    bounds = np.concatenate([[0], np.cumsum(length)])
+    return np.array([" ".join(picks[bounds[i]:bounds[i + 1]]).title() for i in range(n)], dtype=object)
+
+
+def _zipf_choice(rng, pool, n, exponent=0.9):
+    # Few very frequent values and a long tail, like artists and titles in the real data.
+    weights = 1.0 / np.arange(1, len(pool) + 1) ** exponent
+    return pool[rng.choice(len(pool), n, p=weights / weights.sum())]
+
+
+def _ordinal(number):
+    suffix = "th" if 10 <= number % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(number % 10, "th")
+    return f"{number}{suffix}"
+
+
+def _beta(rng, a, b, n, decimals=3):
+    return np.round(rng.beta(a, b, n), decimals)
+
+
+def generating_pools(scale=1, seed=0):
+    """
+    Name pools shared by the three generators: artists and track titles.
+
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        "artists": _artist_pool(rng, int(31500 * scale)),
+        "tracks": _track_pool(rng, int(73600 * scale)),
+    }
+
+
+def generating_spotify(scale=1, seed=0, pools=None):
+    """
+    Spotify tracks with the columns of spotify_dataset.csv, 1,000 tracks per genre
+    at scale 1 and about 21% of the tracks repeated under a second genre.
+
+    """
+    rng = np.random.default_rng(seed + 1)
+    pools = pools or generating_pools(scale, seed)
+    unique = int(SPOTIFY_ROWS * scale * 0.79)
+
+    artists = _zipf_choice(rng, pools["artists"], unique)
+    featured = rng.random(unique) < 0.13
+    artists[featured] = artists[featured] + ";" + _zipf_choice(rng, pools["artists"], featured.sum())
+
+    popularity = np.where(rng.random(unique) < 0.14, 0, np.clip(rng.normal(39, 19, unique), 1, 100)).astype(int)
+    mode = (rng.random(unique) < 0.638).astype(int)
+    instrumental = np.where(rng.random(unique) < 0.7, rng.beta(0.3, 30, unique), rng.beta(1.2, 1.0, unique))
+
+    tracks = pd.DataFrame({
+        "track_id": [f"{value:022x}"[-22:] for value in rng.integers(0, 2 ** 62, unique)],
+        "artists": artists,
+        "album_name": _zipf_choice(rng, pools["tracks"], unique, 0.6),
+        "track_name": _zipf_choice(rng, pools["tracks"], unique, 0.6),
+        "popularity": popularity,
+        "duration_ms": np.clip(rng.lognormal(np.log(213000), 0.35, unique), 8000, 5_000_000).astype(int),
+        "explicit": rng.random(unique) < 0.085,
+        "danceability": _beta(rng, 5.0, 3.8, unique),
+        "energy": _beta(rng, 2.6, 1.45, unique),
+        "key": rng.integers(0, 12, unique),
+        "loudness": np.round(np.minimum(rng.normal(-8.26, 5.03, unique), 4.5), 3),
+        "mode": mode,
+        "speechiness": _beta(rng, 0.9, 9.7, unique),
+        "acousticness": _beta(rng, 0.45, 1.0, unique),
+        "instrumentalness": np.round(instrumental, 6),
+        "liveness": np.round(0.03 + rng.beta(1.3, 6.0, unique), 3),
+        "valence": _beta(rng, 1.9, 2.1, unique),
+        "tempo": np.round(np.clip(rng.normal(122, 30, unique), 0, 243), 3),
+        "time_signature": rng.choice([4, 3, 5, 1, 0], unique, p=[0.894, 0.08, 0.017, 0.008, 0.001]),
+    })
+
+    # Every track gets a genre; some are listed again under another one, as in the real file.
+    repeated = tracks.sample(n=int(SPOTIFY_ROWS * scale) - unique, replace=True, random_state=seed)
+    df = pd.concat([tracks, repeated], ignore_index=True)
+    df.insert(len(df.columns), "track_genre", np.repeat(GENRES, -(-len(df) // len(GENRES)))[:len(df)])
+    df = df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    # The real file has one track without artist, album and name.
+    df.loc[len(df) // 2, ["artists", "album_name", "track_name"]] = np.nan
+    df.insert(0, "Unnamed: 0", np.arange(len(df)))
+    return df
+
+
+def _workers(rng, pools, n):
+    names = _zipf_choice(rng, pools["artists"], 3 * n)
+    roles = rng.choice(ROLES, 3 * n)
+    parts = rng.integers(1, 4, n)
+    performers = rng.random(n) < 0.15
+    values = []
+    for i in range(n):
+        credits = [f"{names[3 * i + j]}, {roles[3 * i + j]}" for j in range(parts[i])]
+        value = "; ".join(credits)
+        if performers[i]:
+            value += f" ({names[3 * i + 2]})"
+        values.append(value)
+    return values
+
+
+def generating_grammys(scale=1, seed=0, pools=None):
+    """
+    Grammys nominations with the columns of the_grammy_awards.csv. About a third of
+    the nominees are Spotify track titles; 38% have no artist and 46% no workers.
+
+    """
+    rng = np.random.default_rng(seed + 2)
+    pools = pools or generating_pools(scale, seed)
+    n = int(GRAMMYS_ROWS * scale)
+
+    # More nominations every year, as the number of categories grew.
+    year = np.sort(np.round(1958 + 61 * rng.beta(1.6, 1.0, n)).astype(int))
+    published = pd.to_datetime((year + 1).astype(str), format="%Y") + pd.to_timedelta(rng.integers(0, 300, n), unit="D")
+
+    from_spotify = rng.random(n) < 0.35
+    nominee = np.where(from_spotify, _zipf_choice(rng, pools["tracks"], n, 0.6), _track_pool(rng, n)).astype(object)
+    nominee[rng.random(n) < 0.00125] = None
+
+    artist = _zipf_choice(rng, pools["artists"], n).astype(object)
+    no_artist = rng.random(n) < 0.3825
+    artist[no_artist] = None
+    # Nominations without artist usually credit it in 'workers'.
+    workers = np.array(_workers(rng, pools, n), dtype=object)
+    workers[~no_artist & (rng.random(n) < 0.70)] = None
+    workers[no_artist & (rng.random(n) < 0.10)] = None
+
+    img = np.array([f"https://www.grammy.com/sites/com/files/styles/artist_circle/public/muzooka/{i}.jpg" for i in range(n)],
+                   dtype=object)
+    img[rng.random(n) < 0.284] = None
+
+    return pd.DataFrame({
+        "year": year,
+        "title": [f"{_ordinal(y - 1957)} Annual GRAMMY Awards  ({y})" for y in year],
+        "published_at": published.strftime("%Y-%m-%dT%H:%M:%S-07:00"),
+        "updated_at": published.strftime("%Y-%m-%dT%H:%M:%S-07:00"),
+        "category": rng.choice(CATEGORIES, n),
+        "nominee": nominee,
+        "artist": artist,
+        "workers": workers,
+        "img": img,
+        "winner": True,
+    })
+
+
+def generating_musicbrainz(scale=1, seed=0, pools=None):
+    """
+    Rows of the MusicBrainz artist search (the extract_musicbrainz output), drawn from
+    the Spotify artists: mostly one row per artist plus homonyms with another country.
+
+    """
+    rng = np.random.default_rng(seed + 3)
+    pools = pools or generating_pools(scale, seed)
+    n = int(MUSICBRAINZ_ROWS * scale)
+
+    artist = _zipf_choice(rng, pools["artists"], n, 0.5)
+    country = rng.choice(COUNTRIES, n, p=COUNTRY_WEIGHTS).astype(object)
+    country[rng.random(n) < 0.0776] = None
+    kind = rng.choice(len(TYPES), n, p=TYPE_WEIGHTS)
+    begin_year = rng.integers(1900, 2015, n)
+    life_begin = np.array([f"{y}-{m:02d}" if m else str(y) for y, m in zip(begin_year, rng.integers(0, 13, n))],
+                          dtype=object)
+    life_begin[rng.random(n) < 0.08] = None
+    ended = rng.random(n) < 0.293
+    life_end = np.where(ended, (begin_year + rng.integers(5, 60, n)).astype(str), None)
+    disambiguation = np.where(rng.random(n) < 0.353, "musician", None)
+
+    return pd.DataFrame({
+        "artist": artist,
+        "country": country,
+        "type": [TYPES[k] for k in kind],
+        "disambiguation": disambiguation,
+        "life_begin": life_begin,
+        "life_end": life_end,
+    })
+
+
+def generating_datasets(scale=1, seed=0):
+    """
+    The three sources at `scale`, sharing the same name pools. Same seed, same data.
+
+    """
+    pools = generating_pools(scale, seed)
+    return {
+        "spotify": generating_spotify(scale, seed, pools),
+        "grammys": generating_grammys(scale, seed, pools),
+        "musicbrainz": generating_musicbrainz(scale, seed, pools),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, default=1, help="Size relative to the current files (1, 10, 100...).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="data/synthetic", help="Directory for the generated CSV files.")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    out.mkdir(parents=True, exist_ok=True)
+    datasets = generating_datasets(args.scale, args.seed)
+
+    datasets["spotify"].to_csv(out / "spotify_dataset.csv", index=False)
+    datasets["grammys"].to_csv(out / "the_grammy_awards.csv", index=False)
+    datasets["musicbrainz"].to_csv(out / "musicbrainz_artist.csv", index=False)
+
+    for name, df in datasets.items():
+        print(f"{name}: {df.shape[0]} rows written to {out}")
+
+
+if __name__ == "__main__":
+    main()
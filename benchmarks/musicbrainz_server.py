@@ -0,0 +1,275 @@
+"""
+Local stand-in for the MusicBrainz artist search (/ws/2/artist/).
+
+Answers the same JSON shape as musicbrainz.org for Lucene-style OR queries
+(artist:"Name" OR artist:"Other Name") with offset/limit paging. Exact name hits
+come first with score 100, followed by fuzzy hits (names sharing a word). It can
+inject latency, 503 errors, rate-limit responses and requests that never answer
+in time, so the extractor can be load-tested without network access.
+
+Usage:
+    python -m benchmarks.musicbrainz_server --port 8089 --latency 0.05 --error-rate 0.02 --rate-limit 50
+
+and point the extractor at it with MUSICBRAINZ_ENDPOINT=http://127.0.0.1:8089/ws/2/artist/
+
+"""
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+import threading
+import argparse
+import random
+import json
+import time
+import uuid
+import re
+
+import pandas as pd
+
+from benchmarks.generators import generating_musicbrainz
+
+MAX_LIMIT = 100
+FUZZY_HITS_PER_CLAUSE = 25
+
+clause_pattern = re.compile(r'artist:(?:"((?:[^"\\]|\\.)*)"|(\S+))')
+word_pattern = re.compile(r"\w+")
+
+
+def _words(name):
+    # Ordered, so the fuzzy hits do not depend on the hash seed of the process.
+    return list(dict.fromkeys(word_pattern.findall(name.lower())))
+
+
+class ArtistCatalog:
+    """
+    In-memory artist table indexed by lowercase name (exact hits) and by word (fuzzy hits).
+
+    """
+
+    def __init__(self, df):
+        self.artists = []
+        for position, row in enumerate(df.itertuples(index=False)):
+            # MusicBrainz leaves out the fields it has no value for.
+            fields = {"type": row.type, "name": row.artist, "sort-name": row.artist,
+                      "country": row.country, "disambiguation": row.disambiguation}
+            life_span = {"begin": row.life_begin, "end": row.life_end}
+            artist = {"id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"artist/{position}"))}
+            artist.update({key: value for key, value in fields.items() if not pd.isna(value)})
+            artist["life-span"] = {key: value for key, value in life_span.items() if not pd.isna(value)}
+            self.artists.append(artist)
+
+        self.by_name = defaultdict(list)
+        self.by_word = defaultdict(list)
+        for position, artist in enumerate(self.artists):
+            self.by_name[artist["name"].lower()].append(position)
+            for word in _words(artist["name"]):
+                self.by_word[word].append(position)
+
+    def searching(self, names):
+        """
+        Returns [(score, position)] for an OR of `names`: exact hits (score 100) first,
+        then up to FUZZY_HITS_PER_CLAUSE fuzzy hits per name, by shared words.
+
+        """
+        exact, fuzzy, seen = [], [], set()
+        for name in names:
+            for position in self.by_name.get(name.lower(), []):
+                if position not in seen:
+                    seen.add(position)
+                    exact.append((100, position))
+
+        for name in names:
+            words = _words(name)
+            shared = Counter(position for word in words for position in self.by_word.get(word, []))
+            for position, count in shared.most_common(FUZZY_HITS_PER_CLAUSE):
+                if position not in seen:
+                    seen.add(position)
+                    fuzzy.append((int(90 * count / max(len(words), 1)), position))
+
+        fuzzy.sort(key=lambda hit: -hit[0])
+        return exact + fuzzy
+
+
+class FaultInjection:
+    """
+    What the stand-in does to requests: fixed latency plus jitter, a share of 503
+    errors, a share of requests that hang for `hang_seconds` (client timeouts) and a
+    server-side rate limit answered with `rate_limit_status` and a Retry-After header.
+
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, timeout_rate=0.0, hang_seconds=15.0,
+                 rate_limit=None, rate_limit_status=503, retry_after=1, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.hang_seconds = hang_seconds
+        self.rate_limit = rate_limit
+        self.rate_limit_status = rate_limit_status
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_requests = 0
+
+    def drawing(self):
+        """
+        Decides the fate of one request: "rate_limited", "error", "hang" or "ok".
+
+        """
+        with self.lock:
+            if self.rate_limit:
+                now = time.monotonic()
+                if now - self.window_start >= 1.0:
+                    self.window_start, self.window_requests = now, 0
+                self.window_requests += 1
+                if self.window_requests > self.rate_limit:
+                    return "rate_limited"
+            draw = self.random.random()
+            delay = self.latency + self.random.uniform(0, self.jitter)
+        time.sleep(delay)
+        if draw < self.error_rate:
+            return "error"
+        if draw < self.error_rate + self.timeout_rate:
+            return "hang"
+        return "ok"
+
+
+class MusicBrainzStandIn:
+    """
+    The fake /ws/2/artist/ service on a background thread.
+
+        with MusicBrainzStandIn(catalog_df, FaultInjection(latency=0.05)) as server:
+            ... server.url ...
+            server.stats()
+
+    """
+
+    def __init__(self, catalog=None, faults=None, host="127.0.0.1", port=0):
+        self.catalog = ArtistCatalog(catalog if catalog is not None else generating_musicbrainz())
+        self.faults = faults or FaultInjection()
+        self.counts = Counter()
+        self.lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/ws/2/artist/"
+
+    def counting(self, outcome):
+        with self.lock:
+            self.counts["requests"] += 1
+            self.counts[outcome] += 1
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _sending(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path.rstrip("/") != "/ws/2/artist":
+                    server.counting("not_found")
+                    return self._sending(404, {"error": "Not Found"})
+
+                outcome = server.faults.drawing()
+                if outcome == "rate_limited":
+                    server.counting("rate_limited")
+                    return self._sending(server.faults.rate_limit_status,
+                                         {"error": "Your requests are exceeding the allowable rate limit."},
+                                         {"Retry-After": str(server.faults.retry_after)})
+                if outcome == "error":
+                    server.counting("error")
+                    return self._sending(503, {"error": "Service temporarily unavailable."})
+                if outcome == "hang":
+                    server.counting("hang")
+                    time.sleep(server.faults.hang_seconds)
+                    return self._sending(503, {"error": "Timed out."})
+
+                params = parse_qs(url.query)
+                query = params.get("query", [""])[0]
+                offset = int(params.get("offset", ["0"])[0])
+                limit = min(int(params.get("limit", ["25"])[0]), MAX_LIMIT)
+
+                names = [quoted.replace('\\"', '"') if quoted else bare for quoted, bare in clause_pattern.findall(query)]
+                hits = server.catalog.searching(names)
+                artists = [dict(server.catalog.artists[position], score=score) for score, position in hits[offset:offset + limit]]
+
+                server.counting("ok")
+                self._sending(200, {
+                    "created": datetime.now(timezone.utc).isoformat(),
+                    "count": len(hits),
+                    "offset": offset,
+                    "artists": artists,
+                })
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--catalog", help="CSV with the extractor columns (artist, country, type...). Synthetic if omitted.")
+    parser.add_argument("--scale", type=float, default=1, help="Size of the synthetic catalog.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request.")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random seconds, up to this value.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503.")
+    parser.add_argument("--timeout-rate", type=float, default=0.0, help="Share of requests that hang.")
+    parser.add_argument("--hang-seconds", type=float, default=15.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Requests per second before rate limiting.")
+    parser.add_argument("--rate-limit-status", type=int, default=503, help="503 as MusicBrainz does, or 429.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    catalog = pd.read_csv(args.catalog) if args.catalog else generating_musicbrainz(args.scale, args.seed)
+    faults = FaultInjection(args.latency, args.jitter, args.error_rate, args.timeout_rate, args.hang_seconds,
+                            args.rate_limit, args.rate_limit_status, seed=args.seed)
+    server = MusicBrainzStandIn(catalog, faults, port=args.port).start()
+    print(f"MusicBrainz stand-in serving {len(server.catalog.artists)} artists at {server.url}")
+    try:
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
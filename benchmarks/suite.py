@@ -0,0 +1,206 @@
+"""
+Benchmark suite of the transform and merge stages on synthetic data.
+
+Times transform_artist_data, transforming_spotify_data, transforming_grammys_data
+and merging_datasets one by one and chained end to end, at each requested scale
+of the current files. For every stage it records the best wall time of --repeat
+runs, the throughput (input rows per second) and the peak memory allocated by the
+stage (tracemalloc, measured in one extra untimed run). Each run is
+saved in benchmarks/results/ and compared against the stored baseline.
+
+Usage:
+    python -m benchmarks.suite --scale 1 10 100 [--repeat 3] [--seed 0]
+    python -m benchmarks.suite --scale 1 --save-baseline
+    python -m benchmarks.suite --scale 1 --fail-on-regression --tolerance 0.15 --min-delta 0.05
+
+"""
+from datetime import datetime
+from pathlib import Path
+import argparse
+import tracemalloc
+import platform
+import logging
+import json
+import time
+import sys
+import os
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.generators import generating_datasets
+from utils import instrumentation
+from transform.api_transform import transform_artist_data
+from transform.spotify_transform import transforming_spotify_data
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+
+
+def _unwrapped(function):
+    # The stage itself, without the pipeline metrics wrapper and its own measurements.
+    return getattr(function, "__wrapped__", function)
+
+
+def running_pipeline(data):
+    """
+    The transform and merge stages chained as the DAG runs them.
+
+    """
+    api = _unwrapped(transform_artist_data)(data["musicbrainz"])
+    spotify = _unwrapped(transforming_spotify_data)(data["spotify"])
+    grammys = _unwrapped(transforming_grammys_data)(data["grammys"])
+    return _unwrapped(merging_datasets)(api, spotify, grammys)
+
+
+def measuring(function, inputs, repeat):
+    """
+    Runs function(*inputs) `repeat` times, plus once under tracemalloc (its overhead
+    would distort the timings). Returns the best wall time, the peak traced memory
+    and the result.
+
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = function(*inputs)
+        best = min(best, time.perf_counter() - start)
+
+    result = None
+    tracemalloc.start()
+    try:
+        result = function(*inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def benchmarking_scale(scale, seed, repeat):
+    """
+    Generates the synthetic sources at `scale` and measures every stage and the whole chain.
+
+    """
+    data = generating_datasets(scale, seed)
+    label = f"{scale:g}x"
+    results = {}
+
+    stages = [
+        ("transform_api", transform_artist_data, lambda: (data["musicbrainz"],)),
+        ("transform_spotify", transforming_spotify_data, lambda: (data["spotify"],)),
+        ("transform_grammys", transforming_grammys_data, lambda: (data["grammys"],)),
+    ]
+    outputs = {}
+    for name, function, inputs in stages:
+        args = inputs()
+        seconds, peak, outputs[name] = measuring(_unwrapped(function), args, repeat)
+        results[f"{label}/{name}"] = _summarizing(args, outputs[name], seconds, peak)
+
+    merge_inputs = (outputs["transform_api"], outputs["transform_spotify"], outputs["transform_grammys"])
+    seconds, peak, merged = measuring(_unwrapped(merging_datasets), merge_inputs, repeat)
+    results[f"{label}/merge"] = _summarizing(merge_inputs, merged, seconds, peak)
+
+    seconds, peak, merged = measuring(running_pipeline, (data,), repeat)
+    results[f"{label}/end_to_end"] = _summarizing(tuple(data.values()), merged, seconds, peak)
+
+    return results
+
+
+def _summarizing(inputs, output, seconds, peak):
+    rows_in = sum(df.shape[0] for df in inputs if isinstance(df, pd.DataFrame))
+    return {
+        "rows_in": int(rows_in),
+        "rows_out": int(output.shape[0]) if isinstance(output, pd.DataFrame) else None,
+        "seconds": round(seconds, 4),
+        "rows_per_second": round(rows_in / seconds) if seconds else None,
+        "peak_mb": round(peak / 2 ** 20, 1),
+    }
+
+
+def comparing(results, baseline, tolerance, min_delta=0.05):
+    """
+    Returns {key: (ratio, verdict)} for every result also in the baseline, where ratio
+    is current time / baseline time and the verdict is "slower", "faster" or "same".
+    Differences under `min_delta` seconds are timer noise and always count as "same".
+
+    """
+    comparison = {}
+    for key, result in results.items():
+        reference = baseline.get("results", {}).get(key)
+        if not reference or not reference["seconds"]:
+            continue
+        ratio = result["seconds"] / reference["seconds"]
+        verdict = "slower" if ratio > 1 + tolerance else "faster" if ratio < 1 - tolerance else "same"
+        if abs(result["seconds"] - reference["seconds"]) < min_delta:
+            verdict = "same"
+        comparison[key] = (ratio, verdict)
+    return comparison
+
+
+def printing_report(results, comparison):
+    print(f"{'stage':<26}{'rows in':>12}{'seconds':>10}{'rows/s':>12}{'peak MB':>10}{'vs baseline':>16}")
+    for key, result in results.items():
+        ratio, verdict = comparison.get(key, (None, ""))
+        versus = f"x{ratio:.2f} {verdict}" if ratio else "-"
+        print(f"{key:<26}{result['rows_in']:>12}{result['seconds']:>10.3f}{result['rows_per_second'] or 0:>12}"
+              f"{result['peak_mb']:>10.1f}{versus:>16}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, nargs="+", default=[1], help="Sizes relative to the current files.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage (the best one is reported).")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline results to compare against.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Relative change reported as slower/faster.")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Seconds below which a change is noise.")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 if any stage is slower.")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    # Benchmark runs are not pipeline runs: keep them out of the metrics reports.
+    instrumentation.metrics_dir = ""
+
+    results = {}
+    for scale in args.scale:
+        results.update(benchmarking_scale(scale, args.seed, args.repeat))
+
+    run = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "results": results,
+    }
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    comparison = comparing(results, baseline, args.tolerance, args.min_delta)
+    printing_report(results, comparison)
+
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+    run_path = RESULTS_DIR / f"run_{datetime.now():%Y%m%d_%H%M%S}.json"
+    run_path.write_text(json.dumps(run, indent=2))
+    print(f"Results saved to {run_path}")
+
+    if args.save_baseline:
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(run, indent=2))
+        print(f"Baseline saved to {baseline_path}")
+
+    if args.fail_on_regression and any(verdict == "slower" for _, verdict in comparison.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
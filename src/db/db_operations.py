@@ -1,12 +1,20 @@
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, inspect, BigInteger, Boolean, Integer, Float, String, Text, DateTime, MetaData, Table, Column
 from sqlalchemy_utils import database_exists, create_database
+from psycopg2.extensions import cursor as BaseCursor
 
+from contextlib import contextmanager
+
+import io
 import os
+import csv
 import logging
+import threading
 
 import pandas as pd
 
+from utils.instrumentation import counting, measuring_stage
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
 route = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
@@ -17,39 +25,130 @@ host = os.getenv("DB_HOST")
 port = os.getenv("DB_PORT")
 database = os.getenv("DB_NAME")
 
-def creating_engine():
+pool_size = int(os.getenv("DB_POOL_SIZE", 5))
+max_overflow = int(os.getenv("DB_MAX_OVERFLOW", 5))
+pool_recycle = int(os.getenv("DB_POOL_RECYCLE", 1800))
+
+# One engine (and connection pool) per database URL and process.
+_engines = {}
+_engines_lock = threading.Lock()
+
+class CountingCursor(BaseCursor):
+    """
+    psycopg2 cursor that adds every statement and COPY to the "db_calls" counter of the
+    stage metrics. The shared engines use it for SQLAlchemy and raw connections alike.
     
-    url = f"postgresql://{user}:{password}@{host}:{port}/{database}"
-    engine = create_engine(url)
+    """
+    def execute(self, query, vars=None):
+        counting("db_calls")
+        return super().execute(query, vars)
     
-    if not database_exists(url):
-        create_database(url)
-        logging.info("Database created")
+    def executemany(self, query, vars_list):
+        counting("db_calls")
+        return super().executemany(query, vars_list)
     
-    logging.info("Engine created. You can now connect to the database.")
+    def copy_expert(self, sql, file, size=8192):
+        counting("db_calls")
+        return super().copy_expert(sql, file, size)
+
+def building_url():
+    return f"postgresql://{user}:{password}@{host}:{port}/{database}"
+
+def getting_engine(url=None):
+    """
+    Returns the shared engine for `url` (the .env database by default), creating it
+    on first use. The database bootstrap (create it if missing) also runs only then.
+    
+    The pool checks connections before handing them out (pre-ping) and recycles them
+    periodically, so long-lived workers never get a connection Postgres already closed.
+    
+    """
+    url = url or building_url()
+    key = (url, os.getpid())
+    
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            if not database_exists(url):
+                create_database(url)
+                logging.info("Database created")
+            
+            engine = create_engine(url,
+                                   pool_size=pool_size,
+                                   max_overflow=max_overflow,
+                                   pool_pre_ping=True,
+                                   pool_recycle=pool_recycle,
+                                   connect_args={"cursor_factory": CountingCursor})
+            _engines[key] = engine
+            logging.info("Engine created. You can now connect to the database.")
     
     return engine
 
+def creating_engine():
+    """
+    Kept for existing callers: returns the shared engine instead of a new one.
+    
+    """
+    return getting_engine()
+
+@contextmanager
+def borrowing_connection(engine=None):
+    """
+    Borrows a connection from the pool (the shared engine by default) inside a transaction,
+    which is committed on success and rolled back on error. The connection goes back to the pool.
+    
+    """
+    engine = engine or getting_engine()
+    with engine.begin() as connection:
+        yield connection
+
+@contextmanager
+def borrowing_raw_connection(engine=None):
+    """
+    Borrows a DB-API (psycopg2) connection from the pool (the shared engine by default),
+    for COPY and other driver-level operations. Commits on success and rolls back on error.
+    
+    """
+    connection = (engine or getting_engine()).raw_connection()
+    try:
+        yield connection
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
 def disposing_engine(engine):
+    """
+    Closes every pooled connection of `engine` and removes it from the registry.
+    Stage functions should not call it: the shared engine lives as long as the process.
+    
+    """
+    with _engines_lock:
+        for key, registered in list(_engines.items()):
+            if registered is engine:
+                del _engines[key]
     engine.dispose()
     logging.info("Engine disposed.")
 
 def infering_types(dtype, column_name, df):
-    if "int" in dtype.name:
+    # The pandas checks also cover the nullable dtypes (Int16, Float64, boolean, string).
+    if pd.api.types.is_bool_dtype(dtype):
+        return Boolean
+    elif pd.api.types.is_integer_dtype(dtype):
         return Integer
-    elif "float" in dtype.name:
+    elif pd.api.types.is_float_dtype(dtype):
         return Float
-    elif "object" in dtype.name:
+    elif pd.api.types.is_string_dtype(dtype):
         max_len = df[column_name].astype(str).str.len().max()
         if max_len > 255:
             logging.info(f"Adjusting column {column_name} to Text due to length {max_len}.")
             return Text
         else:
             return String(255)
-    elif "datetime" in dtype.name:
+    elif pd.api.types.is_datetime64_any_dtype(dtype):
         return DateTime
-    elif "bool" in dtype.name:
-        return Boolean
     else:
         return Text
 
@@ -65,27 +164,137 @@ def load_raw_data(engine, df, table_name):
     except Exception as e:
         logging.error(f"Error creating table {table_name}: {e}")
 
-def load_clean_data(engine, df, table_name):
+def copying_dataframe(cursor, df, table_name, chunksize=50000):
+    """
+    Streams a DataFrame into an existing table with COPY ... FROM STDIN, one
+    in-memory chunk at a time, instead of row-batched INSERT statements.
     
-    logging.info(f"Creating table {table_name} from Pandas DataFrame.")
+    The chunks use the text format of COPY: missing values are written as \\N so
+    they arrive as NULL, and the text is escaped (backslashes, tabs, line breaks),
+    so empty strings stay empty strings and a name that is literally \\N is not NULL.
+    
+    """
+    columns = ", ".join(f'"{name}"' for name in df.columns)
+    sql = f"COPY {table_name} ({columns}) FROM STDIN WITH (FORMAT TEXT)"
+    text = [name for name, dtype in df.dtypes.items() if pd.api.types.is_string_dtype(dtype)]
+    
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        if text:
+            chunk = chunk.assign(**{name: _escaping_text(chunk[name]) for name in text})
+        buffer = io.StringIO()
+        chunk.to_csv(buffer, sep="\t", index=False, header=False, na_rep="\\N", quoting=csv.QUOTE_NONE)
+        buffer.seek(0)
+        cursor.copy_expert(sql, buffer)
+
+def _escaping_text(series):
+    # Backslash first, so the escapes added after it are not escaped again.
+    escaped = series.astype(str)
+    for char, escape in [("\\", "\\\\"), ("\t", "\\t"), ("\n", "\\n"), ("\r", "\\r")]:
+        escaped = escaped.str.replace(char, escape, regex=False)
+    return escaped.where(series.notna(), None)
+
+def checking_upsert_key(engine, table_name, key):
+    """
+    Makes sure the existing `table_name` can be upserted on `key`: ON CONFLICT needs a
+    unique constraint or index on exactly those columns. A unique index is created when
+    there is none (it fails if the rows already loaded repeat a key). A primary key on
+    other columns, such as the positional "id" of tables created in another mode, would
+    reject the new rows, so it raises instead.
+    
+    """
+    inspector = inspect(engine)
+    primary_key = inspector.get_pk_constraint(table_name)["constrained_columns"]
+    if primary_key and set(primary_key) != set(key):
+        raise ValueError(f"Table {table_name} has the primary key {primary_key}, so it cannot be upserted on {key}. "
+                         f"Load it in replace mode, or recreate it in upsert mode.")
+    
+    unique_keys = [constraint["column_names"] for constraint in inspector.get_unique_constraints(table_name)]
+    unique_keys += [index["column_names"] for index in inspector.get_indexes(table_name) if index["unique"]]
+    if primary_key or any(set(columns) == set(key) for columns in unique_keys):
+        return
+    
+    key_columns = ", ".join(f'"{name}"' for name in key)
+    with borrowing_connection(engine) as connection:
+        connection.exec_driver_sql(f'CREATE UNIQUE INDEX IF NOT EXISTS "{table_name}_upsert_key" ON "{table_name}" ({key_columns})')
+    logging.info(f"Unique index on {key} created in table {table_name}.")
+
+def upserting_dataframe(cursor, df, table_name, key, chunksize=50000):
+    """
+    Loads a DataFrame into a temporary staging table with COPY and merges it
+    into `table_name` with INSERT ... ON CONFLICT (key) DO UPDATE.
+    
+    If the DataFrame repeats a key, only one of those rows is kept.
+    
+    """
+    staging = f"{table_name}_staging"
+    columns = ", ".join(f'"{name}"' for name in df.columns)
+    key_columns = ", ".join(f'"{name}"' for name in key)
+    updates = ", ".join(f'"{name}" = EXCLUDED."{name}"' for name in df.columns if name not in key)
+    
+    cursor.execute(f'CREATE TEMP TABLE "{staging}" (LIKE "{table_name}" INCLUDING DEFAULTS) ON COMMIT DROP')
+    copying_dataframe(cursor, df, f'"{staging}"', chunksize)
+    
+    conflict_action = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+    cursor.execute(
+        f'INSERT INTO "{table_name}" ({columns}) '
+        f'SELECT DISTINCT ON ({key_columns}) {columns} FROM "{staging}" ORDER BY {key_columns} '
+        f'ON CONFLICT ({key_columns}) {conflict_action}'
+    )
+    logging.info(f"{cursor.rowcount} rows inserted or updated in table {table_name}.")
+
+@measuring_stage("load")
+def load_clean_data(engine, df, table_name, mode="create", key=None, chunksize=50000):
+    """
+    Loads a clean DataFrame into `table_name` using COPY.
+    
+    Modes:
+        "create": creates the table and loads it; does nothing if the table already exists.
+        "append": creates the table if needed and appends the rows.
+        "replace": creates the table if needed and swaps its rows for the DataFrame's
+                   (TRUNCATE and COPY in one transaction).
+        "upsert": creates the table if needed (with `key` as primary key) and inserts
+                  new rows or updates the existing ones with the same `key`. An existing
+                  table gets a unique index on `key` if it has none (see checking_upsert_key).
+    
+    """
+    
+    logging.info(f"Loading table {table_name} from Pandas DataFrame ({mode} mode).")
+    
+    if mode == "upsert" and not key:
+        raise ValueError("The upsert mode needs the columns of the natural key.")
     
     try:
-        if not inspect(engine).has_table(table_name):
+        exists = inspect(engine).has_table(table_name)
+        
+        if exists and mode == "create":
+            logging.error(f"Table {table_name} already exists.")
+            return
+        
+        if not exists:
+            primary_key = key if mode == "upsert" else ["id"]
             metadata = MetaData()
             columns = [Column(name,
                             infering_types(dtype, name, df),
-                            primary_key=(name == "id")) \
+                            primary_key=(name in primary_key)) \
                                 for name, dtype in df.dtypes.items()]
             
             table = Table(table_name, metadata, *columns)
             table.create(engine)
             
             logging.info(f"Table {table_name} created successfully.")
+        elif mode == "upsert":
+            checking_upsert_key(engine, table_name, key)
+        
+        with borrowing_raw_connection(engine) as connection:
+            with connection.cursor() as cursor:
+                if mode == "upsert":
+                    upserting_dataframe(cursor, df, table_name, key, chunksize)
+                else:
+                    if mode == "replace":
+                        cursor.execute(f'TRUNCATE "{table_name}"')
+                    copying_dataframe(cursor, df, f'"{table_name}"', chunksize)
 
-            df.to_sql(table_name, con=engine, if_exists="append", index=False)
-
-            logging.info(f"Data loaded to table {table_name}.")
-        else:
-            logging.error(f"Table {table_name} already exists.")
+        logging.info(f"Data loaded to table {table_name}.")
     except Exception as e:
-        logging.error(f"Error creating table {table_name}: {e}")
\ No newline at end of file
+        logging.error(f"Error loading table {table_name}: {e}")
\ No newline at end of file
@@ -1,11 +1,26 @@
 import os
 import time
+import random
 import logging
+import threading
+import contextvars
 import requests
+from pathlib import Path
+from difflib import SequenceMatcher
 import pandas as pd
 from tqdm import tqdm
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-MUSICBRAINZ_ENDPOINT = "https://musicbrainz.org/ws/2/artist/"
+from extract.rate_limiter import TokenBucket, SharedTokenBucket
+from extract.musicbrainz_cache import MusicBrainzCache
+from extract.checkpoint import ExtractionCheckpoint, fingerprint
+from extract.musicbrainz_offline import importing_musicbrainz_dump, looking_up_artists
+from extract.query_planner import QueryPlanner, build_query
+from utils.normalization import NORMALIZATION_VERSION, cleaning_name, cleaning_names, normalizing_name
+from utils.instrumentation import counting, measuring_stage
+
+MUSICBRAINZ_ENDPOINT = os.getenv("MUSICBRAINZ_ENDPOINT", "https://musicbrainz.org/ws/2/artist/")
 HEADERS = {
     "User-Agent": "workshop2/1.0 (ejemplo@gmail.com)"
 }
@@ -14,56 +29,272 @@ ARTISTS_CSV = ('data/artists.csv')
 RETRY_LIMIT = 3
 BATCH_SIZE = 50
 RESULTS_PER_PAGE = 100
-ARTIST_LIMIT = 5000
+ARTIST_LIMIT = int(os.getenv("MUSICBRAINZ_ARTIST_LIMIT", 5000))
+REQUESTS_PER_SECOND = float(os.getenv("MUSICBRAINZ_REQUESTS_PER_SECOND", 1.0))
+MAX_WORKERS = int(os.getenv("MUSICBRAINZ_MAX_WORKERS", 4))
+REQUEST_TIMEOUT = float(os.getenv("MUSICBRAINZ_TIMEOUT", 10))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+CACHE_PATH = os.getenv("MUSICBRAINZ_CACHE_PATH", "data/musicbrainz_cache.sqlite")
+CACHE_TTL_DAYS = float(os.getenv("MUSICBRAINZ_CACHE_TTL_DAYS", 30))
+CACHE_NEGATIVE_TTL_DAYS = float(os.getenv("MUSICBRAINZ_CACHE_NEGATIVE_TTL_DAYS", 7))
+CHECKPOINT_PATH = os.getenv("MUSICBRAINZ_CHECKPOINT_PATH", "data/checkpoints/musicbrainz.jsonl")
+EXTRACTION_MODE = os.getenv("MUSICBRAINZ_MODE", "online")
+OFFLINE_DUMP_PATH = os.getenv("MUSICBRAINZ_DUMP_PATH", "data/musicbrainz_artist.csv")
+OFFLINE_STORE_PATH = os.getenv("MUSICBRAINZ_OFFLINE_STORE_PATH", "data/musicbrainz_offline.sqlite")
+PLANNER_STATS_PATH = os.getenv("MUSICBRAINZ_PLANNER_STATS_PATH", "data/musicbrainz_query_stats.json")
+RATE_LIMIT_PATH = os.getenv("MUSICBRAINZ_RATE_LIMIT_PATH", "data/musicbrainz_rate_limit.bin")
+SHARDS = int(os.getenv("MUSICBRAINZ_SHARDS", 1))
+MAX_QUERY_LENGTH = 3500
+# Con STOP_EARLY un lote deja de paginar cuando todos sus artistas tienen coincidencia exacta,
+# y uno de un solo artista tras SINGLE_NAME_PAGES páginas; 0 recorre todas las páginas.
+STOP_EARLY = os.getenv("MUSICBRAINZ_STOP_EARLY", "1") not in ("0", "false", "False", "")
+SINGLE_NAME_PAGES = int(os.getenv("MUSICBRAINZ_SINGLE_NAME_PAGES", 1))
+PLANNER_MAX_NAMES = int(os.getenv("MUSICBRAINZ_PLANNER_MAX_NAMES", 200000))
+
+_limitador = None
+_limitador_lock = threading.Lock()
+_sesion_local = threading.local()
+_peticiones_http = 0
+_peticiones_lock = threading.Lock()
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 def limpiar_nombre(nombre: str) -> str:
-    if pd.isna(nombre) or not nombre.strip():
-        return None
-    nombre = nombre.replace("\\", "")
-    nombre = nombre.replace('"', '')
-    nombre = nombre.replace("'", "")
-    nombre = nombre.replace("/", " ")
-    nombre = nombre.replace("&", "and")
-    nombre = nombre.strip()
-    return nombre
-
-def _cargar_y_limpiar_artistas(ruta_csv: str) -> list:
+    return cleaning_name(nombre)
+
+def _clave_cache(nombre: str) -> str:
+    return normalizing_name(nombre)
+
+def _cargar_y_limpiar_artistas(ruta_csv: str, limite: int = ARTIST_LIMIT) -> list:
     df = pd.read_csv(ruta_csv, header=None, names=["raw"])
-    nombres_limpios = [limpiar_nombre(nombre) for nombre in df["raw"]]
+    nombres_limpios = cleaning_names(df["raw"]).dropna()
     
-    artistas_unicos = sorted(set([nombre for nombre in nombres_limpios if nombre]))
-    artistas_limitados = artistas_unicos[:ARTIST_LIMIT] if ARTIST_LIMIT else artistas_unicos
+    artistas_unicos = sorted(set(nombres_limpios))
+    artistas_limitados = artistas_unicos[:limite] if limite else artistas_unicos
 
     logging.info(f"✅ Total artistas únicos procesados: {len(artistas_limitados)}")
     return artistas_limitados
 
-def _consultar_musicbrainz(artistas: list) -> list: # Cambiado nombre del parámetro
-    resultados = []
-    logging.info("🎧 Consultando MusicBrainz...")
-    
-    with tqdm(total=len(artistas), desc="🔎 MusicBrainz") as pbar:
-        for i in range(0, len(artistas), BATCH_SIZE):
-            lote_artistas = artistas[i:i + BATCH_SIZE]
-            query = ' OR '.join([f'artist:"{artista}"' for artista in lote_artistas])
-            page = 1
-            while True:
-                info_lote = _buscar_artista_musicbrainz_lote(query, page)
+def seleccionar_shard(artistas: list, shard: int, shards: int) -> list:
+    """
+    Parte contigua de `artistas` que le toca al shard `shard` de `shards`. Los shards
+    concatenados en orden devuelven la lista original.
+
+    """
+    if not 0 <= shard < shards:
+        raise ValueError(f"Shard {shard} fuera de rango para {shards} shards.")
+    tamano = -(-len(artistas) // shards)
+    return artistas[shard * tamano:(shard + 1) * tamano]
+
+def _crear_sesion() -> requests.Session:
+    sesion = requests.Session()
+    sesion.headers.update(HEADERS)
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS)
+    sesion.mount("https://", adaptador)
+    sesion.mount("http://", adaptador)
+    return sesion
+
+def _obtener_limitador():
+    # Se crea con la primera petición y no al importar el módulo: importar (p. ej. al
+    # parsear el DAG) no debe crear el archivo del limitador.
+    # Con RATE_LIMIT_PATH el límite se comparte entre los procesos de un mismo host
+    # (p. ej. los shards de la extracción en Airflow); flock no coordina varios hosts.
+    global _limitador
+    with _limitador_lock:
+        if _limitador is None:
+            _limitador = SharedTokenBucket(RATE_LIMIT_PATH, REQUESTS_PER_SECOND) if RATE_LIMIT_PATH else TokenBucket(REQUESTS_PER_SECOND)
+        return _limitador
+
+def _obtener_sesion() -> requests.Session:
+    # Una sesión keep-alive por hilo: requests.Session no es thread-safe,
+    # pero cada hilo reutiliza su conexión durante toda la extracción.
+    if not hasattr(_sesion_local, "sesion"):
+        _sesion_local.sesion = _crear_sesion()
+    return _sesion_local.sesion
+
+def _contar_peticion() -> None:
+    global _peticiones_http
+    with _peticiones_lock:
+        _peticiones_http += 1
+    counting("http_requests")
+
+def _tiempo_de_espera(response, intento: int) -> float:
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return min(float(retry_after), BACKOFF_MAX)
+        except ValueError:
+            pass
+    espera = BACKOFF_BASE * (2 ** intento)
+    return min(espera + random.uniform(0, espera / 2), BACKOFF_MAX)
+
+def _procesar_lote(lote_artistas: list, indice: int = None, checkpoint: ExtractionCheckpoint = None,
+                   planner: QueryPlanner = None) -> tuple:
+    """
+    Recorre las páginas de un lote. Devuelve las filas obtenidas y si el lote
+    se completó sin errores (un lote fallido no debe guardarse en la caché).
+
+    Con STOP_EARLY, la paginación se detiene en cuanto todos los artistas del lote
+    tienen una coincidencia exacta: las páginas siguientes solo traen coincidencias
+    difusas, que se pierden. Un lote de un solo artista (los nombres "ruidosos" que
+    el planificador aísla) se detiene además tras SINGLE_NAME_PAGES páginas: sus
+    coincidencias exactas, de puntuación 100, llegan en la primera.
+
+    Con checkpoint, cada página se persiste al recibirse y el lote continúa desde
+    la última página guardada.
+
+    """
+    query = build_query(lote_artistas)
+    resultados_lote = []
+    page = 1
+    if checkpoint is not None and indice in checkpoint.pages:
+        resultados_lote = list(checkpoint.rows[indice])
+        page = checkpoint.pages[indice] + 1
+
+    claves_lote = {_clave_cache(artista) for artista in lote_artistas}
+    resueltos = {}
+    filas_exactas = 0
+    for fila in resultados_lote:
+        clave = _clave_cache(fila["artist"])
+        if clave in claves_lote:
+            resueltos.setdefault(clave, 1)
+            filas_exactas += 1
+
+    while True:
+        info_lote = _buscar_artista_musicbrainz_lote(query, page)
+
+        if info_lote is None:
+            return resultados_lote, False
+
+        resultados_lote.extend(info_lote)
+        for fila in info_lote:
+            clave = _clave_cache(fila["artist"])
+            if clave in claves_lote:
+                resueltos.setdefault(clave, page)
+                filas_exactas += 1
+
+        terminado = len(info_lote) < RESULTS_PER_PAGE
+        if STOP_EARLY:
+            terminado = (terminado or len(resueltos) == len(claves_lote)
+                         or (len(claves_lote) == 1 and page >= SINGLE_NAME_PAGES))
+        if checkpoint is not None:
+            # La última página y el fin del lote se guardan juntos: al reanudar no se pide otra.
+            checkpoint.save_page(indice, page, info_lote, last=terminado)
+        if terminado:
+            if planner is not None:
+                planner.observe(lote_artistas, resueltos, page, filas_exactas, _clave_cache)
+            return resultados_lote, True
+
+        page += 1
+
+def _filas_por_artista(lote_artistas: list, filas: list) -> dict:
+    """
+    Reparte todas las filas de un lote entre sus artistas: cada fila va al artista con
+    su mismo nombre o, si es una coincidencia difusa, al de nombre más parecido (el
+    primero del lote en caso de empate). Así la caché guarda todo lo que devolvió la
+    API y una ejecución en caliente devuelve lo mismo que una en frío. Los artistas
+    sin ninguna fila quedan como entrada negativa.
 
-                if info_lote:
-                    resultados.extend(info_lote)
-                else:
-                    pass
+    """
+    claves = list(dict.fromkeys(_clave_cache(artista) for artista in lote_artistas))
+    por_clave = {clave: [] for clave in claves}
+    for fila in filas:
+        clave = _clave_cache(fila["artist"]) or ""
+        if clave not in por_clave:
+            clave = max(claves, key=lambda candidata: SequenceMatcher(None, candidata, clave).ratio())
+        por_clave[clave].append(fila)
+    return por_clave
 
-                if not info_lote or len(info_lote) < RESULTS_PER_PAGE:
-                    break
+def _planificar_consulta(artistas: list, cache: MusicBrainzCache = None, planner: QueryPlanner = None) -> dict:
+    """
+    Resuelve desde la caché lo que se pueda y agrupa el resto en lotes para la API.
+    Cada clave se consulta una sola vez, con el primer nombre de `artistas` que la tiene.
 
-                page += 1
-                time.sleep(1.1)
-            pbar.update(len(lote_artistas))
+    """
+    por_clave = {}
+    for artista in artistas:
+        por_clave.setdefault(_clave_cache(artista), artista)
 
-    return resultados
+    resultados_cache = {}
+    if cache is not None:
+        resultados_cache = cache.get_many(list(por_clave))
+        estadisticas = cache.stats()
+        logging.info(f"🗃️ Caché MusicBrainz: {estadisticas['hits']} aciertos, {estadisticas['misses']} fallos "
+                     f"({estadisticas['expired']} expirados).")
+    pendientes = [artista for clave, artista in por_clave.items() if clave not in resultados_cache]
+
+    if planner is not None:
+        lotes = planner.plan(pendientes, _clave_cache)
+    else:
+        lotes = [pendientes[i:i + BATCH_SIZE] for i in range(0, len(pendientes), BATCH_SIZE)]
+    return {"cache_rows": resultados_cache, "batches": lotes}
+
+def _consultar_musicbrainz(artistas: list, cache: MusicBrainzCache = None,
+                           checkpoint: ExtractionCheckpoint = None,
+                           planner: QueryPlanner = None) -> list: # Cambiado nombre del parámetro
+    if checkpoint is not None and checkpoint.load():
+        # El plan guardado (incluidas las filas servidas por la caché) se reutiliza tal cual
+        # para que la salida sea idéntica a la de una ejecución sin interrupciones.
+        plan = checkpoint.plan
+    else:
+        plan = _planificar_consulta(artistas, cache, planner)
+        if checkpoint is not None:
+            checkpoint.start(plan)
+
+    lotes = plan["batches"]
+    resultados_por_lote = [None] * len(lotes)
+    incompletos = []
+    por_consultar = []
+    for indice, lote in enumerate(lotes):
+        if checkpoint is not None and indice in checkpoint.completed:
+            resultados_por_lote[indice] = checkpoint.rows.get(indice, [])
+        else:
+            por_consultar.append(indice)
+
+    logging.info(f"🎧 Consultando MusicBrainz ({len(por_consultar)} de {len(lotes)} lotes) con {MAX_WORKERS} hilos a {REQUESTS_PER_SECOND} peticiones/s...")
+
+    peticiones_iniciales = _peticiones_http
+
+    with tqdm(total=sum(len(lote) for lote in lotes), desc="🔎 MusicBrainz") as pbar, \
+            ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        pbar.update(sum(len(lotes[indice]) for indice, filas in enumerate(resultados_por_lote) if filas is not None))
+        # Cada lote corre en el contexto de la etapa, que así cuenta sus peticiones HTTP.
+        futuros = {executor.submit(contextvars.copy_context().run, _procesar_lote, lotes[indice], indice, checkpoint, planner): indice
+                   for indice in por_consultar}
+        for futuro in as_completed(futuros):
+            indice = futuros[futuro]
+            filas, completo = futuro.result()
+            resultados_por_lote[indice] = filas
+            if not completo:
+                incompletos.append(indice)
+            elif cache is not None:
+                cache.put_many(_filas_por_artista(lotes[indice], filas))
+            pbar.update(len(lotes[indice]))
+
+    _reportar_eficiencia(lotes, resultados_por_lote, _peticiones_http - peticiones_iniciales)
+
+    if incompletos:
+        # Devolver las filas parciales daría por buena una extracción incompleta. El checkpoint
+        # conserva las páginas ya obtenidas, así que el reintento solo repite lo que falta.
+        raise RuntimeError(f"{len(incompletos)} de {len(lotes)} lotes siguen incompletos tras {RETRY_LIMIT} intentos.")
+
+    # Las filas salen agrupadas por artista, en el orden de `artistas` (el de los lotes
+    # originales), vengan de la caché o de la API: la salida no depende de qué había en caché.
+    filas_por_clave = dict(plan["cache_rows"])
+    for lote, filas in zip(lotes, resultados_por_lote):
+        filas_por_clave.update(_filas_por_artista(lote, filas))
+    claves = dict.fromkeys(_clave_cache(artista) for artista in artistas)
+    return [fila for clave in claves for fila in filas_por_clave.get(clave, [])]
+
+def _reportar_eficiencia(lotes: list, resultados_por_lote: list, peticiones: int) -> None:
+    resueltos = 0
+    for lote, filas in zip(lotes, resultados_por_lote):
+        encontrados = {_clave_cache(fila["artist"]) for fila in filas or []}
+        resueltos += sum(1 for artista in lote if _clave_cache(artista) in encontrados)
+    por_artista = peticiones / resueltos if resueltos else float("nan")
+    logging.info(f"📊 {peticiones} peticiones HTTP para {resueltos} artistas resueltos "
+                 f"({por_artista:.3f} peticiones por artista resuelto).")
 
 def _buscar_artista_musicbrainz_lote(query: str, page: int) -> list:
     params = {
@@ -74,8 +305,11 @@ def _buscar_artista_musicbrainz_lote(query: str, page: int) -> list:
     }
 
     for intento in range(RETRY_LIMIT):
+        response = None
         try:
-            response = requests.get(MUSICBRAINZ_ENDPOINT, headers=HEADERS, params=params, timeout=10)
+            _obtener_limitador().acquire()
+            _contar_peticion()
+            response = _obtener_sesion().get(MUSICBRAINZ_ENDPOINT, params=params, timeout=REQUEST_TIMEOUT)
             response.raise_for_status()
             data = response.json()
 
@@ -98,22 +332,95 @@ def _buscar_artista_musicbrainz_lote(query: str, page: int) -> list:
             logging.error(f"❌ Error al consultar lote (Intento {intento + 1}/{RETRY_LIMIT}) - Página {page}: {e}")
             if intento == RETRY_LIMIT - 1:
                  logging.error(f"❌ Falló consulta del lote tras {RETRY_LIMIT} intentos.")
-            time.sleep(2 * (intento + 1))
+                 return None
+            espera = _tiempo_de_espera(response, intento)
+            if response is not None and response.status_code in (429, 503):
+                # El servidor indica que vamos por encima del límite: se frena a todos los hilos.
+                _obtener_limitador().pause(espera)
+            else:
+                time.sleep(espera)
         except Exception as e:
             logging.error(f"❌ Error inesperado al consultar lote (Página {page}): {e}")
-            return []
+            return None
 
-    return []
+    return None
 
-def extract_musicbrainz() -> pd.DataFrame:
+def _consultar_offline(artistas: list) -> list:
+    importing_musicbrainz_dump(OFFLINE_DUMP_PATH, OFFLINE_STORE_PATH, _clave_cache, NORMALIZATION_VERSION)
+    return looking_up_artists(artistas, OFFLINE_STORE_PATH, _clave_cache)
 
-    artistas_a_consultar = _cargar_y_limpiar_artistas(ARTISTS_CSV)
+@measuring_stage("extract_api")
+def extract_musicbrainz(mode: str = None, shard: int = None, shards: int = None) -> pd.DataFrame:
+    """
+    Extrae la información de los artistas de MusicBrainz.
+
+    En modo "online" (por defecto) consulta la API, limitado a ARTIST_LIMIT artistas
+    (0 para todos). Con `shard` solo se consulta esa parte contigua de la lista de
+    `shards` (SHARDS por defecto), para repartir la extracción entre varios procesos;
+    todos respetan el mismo límite de peticiones (RATE_LIMIT_PATH) y los resultados
+    se juntan con `unir_shards`.
+    En modo "offline" responde desde un volcado local importado a SQLite, sin límite
+    de peticiones, así que se enriquece la lista completa de artistas. Como no hay
+    límite que repartir, la hace entera el shard 0 y los demás devuelven un DataFrame vacío.
 
-    resultados = _consultar_musicbrainz(artistas_a_consultar)
+    """
+    mode = mode or EXTRACTION_MODE
+    shards = shards or SHARDS
     columnas = ["artist", "country", "type", "disambiguation", "life_begin", "life_end"]
 
+    if mode == "offline":
+        if shard:
+            return pd.DataFrame(columns=columnas)
+        artistas_a_consultar = _cargar_y_limpiar_artistas(ARTISTS_CSV, limite=None)
+        resultados = _consultar_offline(artistas_a_consultar)
+        logging.info("✅ Consulta offline completada.")
+        return pd.DataFrame(resultados, columns=columnas)
+
+    if mode != "online":
+        raise ValueError(f"Modo de extracción desconocido: {mode}. Usa 'online' u 'offline'.")
+
+    artistas_a_consultar = _cargar_y_limpiar_artistas(ARTISTS_CSV)
+    checkpoint_path = CHECKPOINT_PATH
+    if shard is not None:
+        artistas_a_consultar = seleccionar_shard(artistas_a_consultar, shard, shards)
+        logging.info(f"🧩 Shard {shard + 1} de {shards}: {len(artistas_a_consultar)} artistas.")
+        if checkpoint_path:
+            # Cada shard lleva su propio checkpoint para poder reintentarse por separado.
+            ruta = Path(checkpoint_path)
+            checkpoint_path = ruta.with_name(f"{ruta.stem}.shard-{shard}-of-{shards}{ruta.suffix}")
+
+    cache = MusicBrainzCache(CACHE_PATH, CACHE_TTL_DAYS, CACHE_NEGATIVE_TTL_DAYS, NORMALIZATION_VERSION) if CACHE_PATH else None
+    planner = QueryPlanner(PLANNER_STATS_PATH, RESULTS_PER_PAGE, BATCH_SIZE, MAX_QUERY_LENGTH, PLANNER_MAX_NAMES,
+                           NORMALIZATION_VERSION)
+    checkpoint = None
+    if checkpoint_path:
+        clave = fingerprint(artistas_a_consultar, BATCH_SIZE, RESULTS_PER_PAGE, STOP_EARLY, SINGLE_NAME_PAGES,
+                            NORMALIZATION_VERSION)
+        checkpoint = ExtractionCheckpoint(checkpoint_path, clave)
+    try:
+        resultados = _consultar_musicbrainz(artistas_a_consultar, cache, checkpoint, planner)
+    finally:
+        if cache is not None:
+            cache.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        planner.save()
+
+    # Solo se descarta el checkpoint cuando la extracción terminó; si falló, el reintento lo retoma.
+    if checkpoint is not None:
+        checkpoint.clear()
+
     logging.info("✅ Consulta completada. Resultados obtenidos:")
 
     df_resultado = pd.DataFrame(resultados, columns=columnas)
 
-    return df_resultado
\ No newline at end of file
+    return df_resultado
+
+
+def unir_shards(partes: list) -> pd.DataFrame:
+    """
+    Junta los resultados de los shards en el orden de los shards (no en el que
+    terminaron), así que la salida es la misma en cada ejecución.
+
+    """
+    return pd.concat(partes, ignore_index=True)
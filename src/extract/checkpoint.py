@@ -0,0 +1,126 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+
+def fingerprint(*parts) -> str:
+    """
+    Stable hash of any JSON-serializable values, used to tell whether a checkpoint
+    belongs to the same extraction.
+
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+class ExtractionCheckpoint:
+    """
+    Append-only progress log for a paginated, batched extraction.
+
+    The first line holds the fingerprint and the extraction plan. Every fetched
+    page and every completed batch is appended as one JSON line, so saving
+    progress costs one small write instead of rewriting everything collected so
+    far. The last page of a batch is saved with the batch marked complete in the
+    same line, so a crash right after it never makes a resume ask for one page more.
+    Loading replays the log; a torn last line (crash mid-write) is ignored.
+
+    """
+
+    def __init__(self, path, key: str):
+        self.path = Path(path)
+        self.key = key
+        self.plan = None
+        self.pages = {}
+        self.rows = {}
+        self.completed = set()
+        self.lock = threading.Lock()
+        self._file = None
+
+    def load(self) -> bool:
+        """
+        Loads a previous checkpoint with the same key. Returns True if there is one to resume.
+
+        """
+        if not self.path.exists():
+            return False
+
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        try:
+            header = json.loads(lines[0])
+        except (IndexError, json.JSONDecodeError):
+            return False
+        if header.get("key") != self.key:
+            logging.info("Checkpoint found for a different extraction, starting from scratch.")
+            return False
+
+        self.plan = header["plan"]
+        for number, line in enumerate(lines[1:], start=1):
+            try:
+                event = json.loads(line)
+            except json.JSONDecodeError:
+                # Drop the torn line so new events are not appended after it.
+                with open(self.path, "w", encoding="utf-8") as f:
+                    f.write("\n".join(lines[:number]) + "\n")
+                break
+            batch = event["batch"]
+            if "page" in event:
+                self.pages[batch] = event["page"]
+                self.rows.setdefault(batch, []).extend(event["rows"])
+            if event.get("completed"):
+                self.completed.add(batch)
+
+        logging.info(f"Resuming from checkpoint: {len(self.completed)} batches already completed.")
+        return True
+
+    def start(self, plan) -> None:
+        """
+        Starts a new checkpoint for `plan`, discarding any previous one.
+
+        """
+        self.plan = plan
+        self.pages, self.rows, self.completed = {}, {}, set()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, "w", encoding="utf-8")
+        self._append({"key": self.key, "plan": plan})
+
+    def _append(self, event) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(json.dumps(event, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def save_page(self, batch: int, page: int, rows: list, last: bool = False) -> None:
+        """
+        Saves one fetched page of `batch`. With `last` the batch is also completed.
+
+        """
+        with self.lock:
+            self.pages[batch] = page
+            self.rows.setdefault(batch, []).extend(rows)
+            event = {"batch": batch, "page": page, "rows": rows}
+            if last:
+                self.completed.add(batch)
+                event["completed"] = True
+            self._append(event)
+
+    def close(self) -> None:
+        """
+        Closes the log file, keeping it on disk so a later run can resume from it.
+
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def clear(self) -> None:
+        self.close()
+        if self.path.exists():
+            self.path.unlink()
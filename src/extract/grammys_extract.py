@@ -1,26 +1,97 @@
-from db.db_operations import creating_engine, disposing_engine
+from db.db_operations import getting_engine, borrowing_raw_connection
+from utils.instrumentation import measuring_stage
 
+from sqlalchemy import select, table, column, func
+
+import io
+import os
 import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+# Columns used by the transform. "published_at", "updated_at" and "img" are dropped there,
+# so they are not requested from the database at all.
+GRAMMYS_COLUMNS = ["year", "title", "category", "nominee", "artist", "workers", "winner"]
+
+CHUNK_SIZE = int(os.getenv("GRAMMYS_CHUNK_SIZE", 10000))
+EXTRACT_METHOD = os.getenv("GRAMMYS_EXTRACT_METHOD", "cursor")
+
+
+def building_grammys_query(columns=GRAMMYS_COLUMNS, table_name="grammys"):
+    """
+    Builds the SELECT with the projection and the `nominee IS NOT NULL` filter pushed down to SQL.
+    
+    """
+    columns = [column(name) for name in columns]
+    return (select(*columns)
+                .select_from(table(table_name, *columns))
+                .where(column("nominee").isnot(None)))
+
+def fingerprinting_grammys_table(table_name="grammys"):
+    """
+    Cheap fingerprint of the Grammys table: its row count and latest `updated_at`.
+    Returns None when it cannot be read, so nothing cached is reused on its account.
+    
+    """
+    engine = getting_engine()
+    
+    try:
+        updated_at = column("updated_at")
+        query = select(func.count(), func.max(updated_at)).select_from(table(table_name, updated_at))
+        with engine.connect() as connection:
+            rows, last_update = connection.execute(query).one()
+        return {"table": table_name, "rows": rows, "updated_at": str(last_update)}
+    except Exception as e:
+        logging.warning(f"Could not fingerprint the {table_name} table: {e}.")
+        return None
+
+def _reading_with_cursor(engine, query, chunksize):
+    # stream_results opens a server-side cursor, so only one chunk at a time crosses the wire.
+    with engine.connect().execution_options(stream_results=True) as connection:
+        chunks = pd.read_sql(query, connection, chunksize=chunksize)
+        return pd.concat(chunks, ignore_index=True)
 
+def _reading_with_copy(engine, query):
+    sql = str(query.compile(engine, compile_kwargs={"literal_binds": True}))
+    buffer = io.BytesIO()
+    
+    with borrowing_raw_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER, NULL '\\N')", buffer)
+    
+    buffer.seek(0)
+    # Postgres writes booleans as t/f in CSV. Only \N is NULL, so empty strings stay
+    # empty strings, as the cursor path returns them.
+    df = pd.read_csv(buffer, true_values=["t"], false_values=["f"], keep_default_na=False, na_values=["\\N"])
+    # The cursor path returns None, not NaN, for the NULLs of text columns.
+    text = df.select_dtypes(include="object").columns
+    df[text] = df[text].astype(object).where(df[text].notna(), None)
+    return df
 
-def extracting_grammys_data():
+@measuring_stage("extract_grammys")
+def extracting_grammys_data(columns=GRAMMYS_COLUMNS, chunksize=CHUNK_SIZE, method=EXTRACT_METHOD):
     """
-    Extracting data from the Spotify CSV file and return it as a DataFrame.   
+    Extracting data from the Grammy Awards table and return it as a DataFrame.   
+
+    Only `columns` and rows with a nominee are read. With method="cursor" the rows are
+    streamed through a server-side cursor in chunks of `chunksize`; with method="copy"
+    Postgres sends the result with COPY ... TO STDOUT, which is parsed in one pass.
 
     """
-    engine = creating_engine()
+    engine = getting_engine()
     
     try:
         logging.info("Extracting data from the Grammy Awards table.")
-        df = pd.read_sql_table("grammys", engine)
-        logging.info("Data extracted from the Grammy Awards table.")
+        query = building_grammys_query(columns)
+        
+        if method == "copy":
+            df = _reading_with_copy(engine, query)
+        else:
+            df = _reading_with_cursor(engine, query, chunksize)
+        
+        logging.info(f"Data extracted from the Grammy Awards table: {df.shape[0]} rows and {df.shape[1]} columns.")
         
         return df
     except Exception as e:
-        logging.error(f"Error extracting data from the Grammy Awards table: {e}.")
-    finally:
-        disposing_engine(engine)
\ No newline at end of file
+        logging.error(f"Error extracting data from the Grammy Awards table: {e}.")
\ No newline at end of file
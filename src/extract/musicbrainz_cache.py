@@ -0,0 +1,114 @@
+import json
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DAY = 24 * 60 * 60
+# Bump when what an entry holds changes, so entries written by older code are dropped.
+CACHE_FORMAT = "2"
+# Seconds a write waits for another process holding the database (the shards of a sharded extraction).
+BUSY_TIMEOUT = 60
+
+
+class MusicBrainzCache:
+    """
+    On-disk cache (SQLite) of MusicBrainz lookups keyed by the normalized artist name.
+
+    Each entry keeps the rows found for one name. Names that returned nothing are
+    stored too (negative entries) with their own, usually shorter, TTL so they are
+    retried from time to time. Expired entries count as misses. A cache written in
+    another CACHE_FORMAT, or keyed with another `key_version` of the name
+    normalization, is emptied when opened, with a warning.
+
+    Several processes may share the file: it is kept in WAL mode, so reads never
+    wait for a write, and a write waits up to BUSY_TIMEOUT seconds for another one
+    instead of failing with "database is locked".
+
+    """
+
+    def __init__(self, path, ttl_days: float = 30, negative_ttl_days: float = 7, key_version: str = ""):
+        self.path = Path(path)
+        self.key_version = key_version
+        self.ttl = ttl_days * DAY
+        self.negative_ttl = negative_ttl_days * DAY
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS artists ("
+            "  key TEXT PRIMARY KEY,"
+            "  rows TEXT NOT NULL,"
+            "  found INTEGER NOT NULL,"
+            "  updated_at REAL NOT NULL"
+            ")"
+        )
+        self.connection.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._checking_format()
+        self.connection.commit()
+
+    def _checking_format(self) -> None:
+        expected = {"format": CACHE_FORMAT, "key_version": self.key_version}
+        found = dict(self.connection.execute("SELECT name, value FROM meta"))
+        if all(found.get(name) == value for name, value in expected.items()):
+            return
+        dropped = self.connection.execute("DELETE FROM artists").rowcount
+        if dropped:
+            logging.warning(f"MusicBrainz cache written with {found or 'an older format'}, now {expected}: "
+                            f"{dropped} entries dropped, this run queries every artist again.")
+        self.connection.executemany("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", expected.items())
+
+    def get_many(self, keys) -> dict:
+        """
+        Returns {key: rows} for every key with a fresh entry. Negative entries map to [].
+
+        """
+        keys = list(dict.fromkeys(keys))
+        now = time.time()
+        found = {}
+
+        with self.lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor = self.connection.execute(
+                    f"SELECT key, rows, found, updated_at FROM artists WHERE key IN ({placeholders})", chunk
+                )
+                for key, rows, was_found, updated_at in cursor:
+                    ttl = self.ttl if was_found else self.negative_ttl
+                    if now - updated_at <= ttl:
+                        found[key] = json.loads(rows)
+                    else:
+                        self.expired += 1
+
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+
+        return found
+
+    def put_many(self, entries: dict) -> None:
+        """
+        Stores {key: rows}. An empty list of rows is stored as a negative entry.
+
+        """
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO artists (key, rows, found, updated_at) VALUES (?, ?, ?, ?)",
+                [(key, json.dumps(rows), int(bool(rows)), now) for key, rows in entries.items()],
+            )
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired}
+
+    def close(self) -> None:
+        self.connection.close()
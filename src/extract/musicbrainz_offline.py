@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import logging
+from pathlib import Path
+
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+COLUMNS = ["artist", "country", "type", "disambiguation", "life_begin", "life_end"]
+CHUNK_SIZE = 50000
+
+
+def _dump_signature(dump_path: Path, key_version: str = "") -> str:
+    stat = dump_path.stat()
+    return f"{dump_path.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{key_version}"
+
+
+def _read_csv_dump(dump_path: Path):
+    for chunk in pd.read_csv(dump_path, dtype=str, keep_default_na=False, chunksize=CHUNK_SIZE):
+        chunk = chunk.reindex(columns=COLUMNS, fill_value="")
+        yield chunk.itertuples(index=False, name=None)
+
+
+def _read_json_dump(dump_path: Path):
+    # MusicBrainz JSON dumps hold one artist object per line.
+    rows = []
+    with open(dump_path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            artist = json.loads(line)
+            life_span = artist.get("life-span") or {}
+            rows.append((
+                artist.get("name", ""),
+                artist.get("country", ""),
+                artist.get("type", ""),
+                artist.get("disambiguation", ""),
+                life_span.get("begin", ""),
+                life_span.get("end", ""),
+            ))
+            if len(rows) >= CHUNK_SIZE:
+                yield rows
+                rows = []
+    if rows:
+        yield rows
+
+
+def importing_musicbrainz_dump(dump_path, store_path, key, key_version: str = "") -> None:
+    """
+    Imports a MusicBrainz artist dump (CSV with the extractor columns, or the
+    JSON-lines dump format) into a SQLite store indexed by the normalized name.
+
+    The import is skipped when the store was already built from the same file
+    (same path, size and modification time) with the same key version.
+
+    Parameters:
+        dump_path (str): Path to the .csv or .json/.jsonl dump.
+        store_path (str): Path of the SQLite store to build.
+        key (callable): Normalization applied to the names, the same used for lookups.
+        key_version (str): Version of `key`; a different one forces a rebuild.
+
+    """
+    dump_path = Path(dump_path)
+    store_path = Path(store_path)
+    signature = _dump_signature(dump_path, key_version)
+
+    store_path.parent.mkdir(parents=True, exist_ok=True)
+    connection = sqlite3.connect(store_path)
+    try:
+        connection.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value TEXT)")
+        current = connection.execute("SELECT value FROM metadata WHERE name = 'dump'").fetchone()
+        if current and current[0] == signature:
+            logging.info(f"Offline MusicBrainz store is up to date with {dump_path}.")
+            return
+
+        logging.info(f"Importing MusicBrainz dump {dump_path} into {store_path}.")
+
+        connection.execute("DROP TABLE IF EXISTS artists")
+        connection.execute(
+            "CREATE TABLE artists (key TEXT, artist TEXT, country TEXT, type TEXT,"
+            " disambiguation TEXT, life_begin TEXT, life_end TEXT)"
+        )
+
+        reader = _read_json_dump if dump_path.suffix in (".json", ".jsonl") else _read_csv_dump
+        total = 0
+        for rows in reader(dump_path):
+            records = [(key(row[0]),) + tuple(row) for row in rows]
+            records = [record for record in records if record[0]]
+            connection.executemany("INSERT INTO artists VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+            total += len(records)
+
+        # The index is built once after the bulk insert, which is much cheaper than maintaining it row by row.
+        connection.execute("CREATE INDEX idx_artists_key ON artists (key)")
+        connection.execute("INSERT OR REPLACE INTO metadata VALUES ('dump', ?)", (signature,))
+        connection.commit()
+
+        logging.info(f"Imported {total} artists into the offline store.")
+    finally:
+        connection.close()
+
+
+def looking_up_artists(artists: list, store_path, key) -> list:
+    """
+    Returns the stored rows whose normalized name matches one of `artists`, in the
+    order of `artists`, with the same columns the MusicBrainz API extraction returns.
+
+    """
+    keys = list(dict.fromkeys(k for k in (key(artist) for artist in artists) if k))
+
+    connection = sqlite3.connect(store_path)
+    try:
+        connection.execute("CREATE TEMP TABLE wanted (key TEXT PRIMARY KEY, position INTEGER)")
+        connection.executemany("INSERT INTO wanted VALUES (?, ?)", [(k, i) for i, k in enumerate(keys)])
+        cursor = connection.execute(
+            "SELECT a.artist, a.country, a.type, a.disambiguation, a.life_begin, a.life_end"
+            " FROM wanted w JOIN artists a ON a.key = w.key"
+            " ORDER BY w.position, a.rowid"
+        )
+        rows = [dict(zip(COLUMNS, row)) for row in cursor]
+    finally:
+        connection.close()
+
+    logging.info(f"Offline lookup: {len(rows)} rows found for {len(keys)} artists.")
+    return rows
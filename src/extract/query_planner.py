@@ -0,0 +1,163 @@
+import os
+import json
+import fcntl
+import logging
+import threading
+from pathlib import Path
+from urllib.parse import quote_plus
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+DEFAULT_RESULTS_PER_CLAUSE = 1.0
+SHORT_NAME_LENGTH = 2
+UNRESOLVED = 0
+MAX_NAMES = 200000
+
+
+def clause(artist: str) -> str:
+    return f'artist:"{artist}"'
+
+
+def build_query(batch: list) -> str:
+    return ' OR '.join(clause(artist) for artist in batch)
+
+
+class QueryPlanner:
+    """
+    Groups artist names into MusicBrainz OR-queries.
+
+    The extractor stops paginating a batch once every name has an exact-name hit,
+    so a batch costs one request when all those hits fit in its first page. Batches
+    are therefore sized so that the exact-name rows expected for their clauses
+    (observed in previous runs, averaged per clause) fit in one page, and so that
+    the encoded query stays under the URL length limit.
+
+    A name that had no exact hit in a previous run, or whose exact hit was pushed
+    past the first page by fuzzy matches, is "noisy": in a shared batch it keeps
+    the whole batch paginating. Noisy names get a batch of their own, which the
+    extractor does not page past its first page(s). Very short names with no
+    history are treated as noisy too.
+
+    The history keeps the `max_names` most recently observed names. It is keyed by
+    normalized names, so a history written with another `key_version` of the
+    normalization is discarded.
+
+    """
+
+    def __init__(self, path=None, results_per_page: int = 100, max_batch_size: int = 50,
+                 max_query_length: int = 3500, max_names: int = MAX_NAMES, key_version: str = ""):
+        self.path = Path(path) if path else None
+        self.key_version = key_version
+        self.results_per_page = results_per_page
+        self.max_batch_size = max_batch_size
+        self.max_query_length = max_query_length
+        self.max_names = max_names
+        self.results_per_clause = DEFAULT_RESULTS_PER_CLAUSE
+        self.names = {}
+        self.observed = {}
+        self.exact_rows = 0
+        self.clauses = 0
+        self.lock = threading.Lock()
+
+        if self.path and self.path.exists():
+            stats = self._reading()
+            self.results_per_clause = stats.get("results_per_clause", DEFAULT_RESULTS_PER_CLAUSE)
+            self.names = stats.get("names", {})
+
+    def _reading(self) -> dict:
+        with open(self.path, encoding="utf-8") as f:
+            stats = json.load(f)
+        if stats.get("key_version", "") != self.key_version:
+            logging.warning(f"Query planner history written with key version {stats.get('key_version', '')!r}, "
+                            f"now {self.key_version!r}: discarded, batches are sized from scratch.")
+            return {}
+        return stats
+
+    def is_noisy(self, key: str) -> bool:
+        if key in self.names:
+            return self.names[key] == UNRESOLVED or self.names[key] > 1
+        return len(key) <= SHORT_NAME_LENGTH
+
+    def plan(self, artists: list, key) -> list:
+        """
+        Returns the list of batches (lists of names) covering `artists`, in their original order.
+
+        """
+        batches, noisy = [], []
+        current, expected, length = [], 0.0, 0
+
+        for artist in artists:
+            artist_key = key(artist)
+            if self.is_noisy(artist_key):
+                noisy.append([artist])
+                continue
+
+            results = self.results_per_clause
+            # The URL length is measured on the encoded clause plus the " OR " separator.
+            clause_length = len(quote_plus(clause(artist))) + len(quote_plus(" OR "))
+
+            if current and (len(current) >= self.max_batch_size
+                            or expected + results > self.results_per_page
+                            or length + clause_length > self.max_query_length):
+                batches.append(current)
+                current, expected, length = [], 0.0, 0
+
+            current.append(artist)
+            expected += results
+            length += clause_length
+
+        if current:
+            batches.append(current)
+
+        logging.info(f"Query plan: {len(batches)} batches and {len(noisy)} noisy names on their own "
+                     f"({self.results_per_clause:.2f} expected results per clause).")
+        return batches + noisy
+
+    def observe(self, batch: list, resolved: dict, pages: int, exact_rows: int, key) -> None:
+        """
+        Records how a completed batch went.
+
+        Parameters:
+            batch (list): The names queried together.
+            resolved (dict): {key: page} with the page where each resolved name got its exact hit.
+            pages (int): Pages fetched for the batch.
+            exact_rows (int): Rows whose name matched one of the queried names.
+            key (callable): Name normalization.
+
+        """
+        if not batch:
+            return
+        with self.lock:
+            for artist in batch:
+                artist_key = key(artist)
+                self.names[artist_key] = self.observed[artist_key] = resolved.get(artist_key, UNRESOLVED)
+            self.exact_rows += exact_rows
+            self.clauses += len(batch)
+
+    def save(self) -> None:
+        """
+        Writes the history back, merging the names observed in this run into the ones
+        already on disk, so concurrent extractions (one per shard) do not drop each
+        other's observations. The names are kept in order of last observation and
+        only the `max_names` most recent ones are written.
+
+        """
+        if self.clauses:
+            self.results_per_clause = self.exact_rows / self.clauses
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_name(self.path.name + ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            names = {}
+            if self.path.exists():
+                names = self._reading().get("names", {})
+            for name in self.observed:
+                names.pop(name, None)
+            names.update(self.observed)
+            if len(names) > self.max_names:
+                names = dict(list(names.items())[len(names) - self.max_names:])
+            tmp_path = self.path.with_name(self.path.name + ".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"key_version": self.key_version, "results_per_clause": self.results_per_clause, "names": names}, f)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,128 @@
+import os
+import time
+import fcntl
+import struct
+import threading
+from pathlib import Path
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. Every call to `acquire` takes one token and blocks
+    until that token is available, so callers never exceed `rate` requests per
+    second on average nor `capacity` requests in a burst.
+
+    Tokens are reserved under the lock and the wait happens outside of it, so
+    concurrent workers are served in arrival order without busy waiting.
+
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        if rate <= 0:
+            raise ValueError("The rate must be greater than zero.")
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self) -> float:
+        """
+        Takes one token, sleeping until it is available. Returns the time waited.
+
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every caller for at least `seconds` (e.g. after a 503 or a
+        Retry-After header). The next token is not available before now + `seconds`,
+        or before the time already reserved if that is later: several threads hit
+        by the same 503 wait one Retry-After, not one each.
+
+        """
+        with self.lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket shared by every process that opens the same `path`, so several
+    extraction workers (e.g. the mapped Airflow tasks of a sharded extraction)
+    together never exceed `rate` requests per second.
+
+    The bucket state (tokens and time of the last refill) lives in a 16-byte file
+    updated under an exclusive `flock`. As in TokenBucket, a token is reserved
+    under the lock and the wait happens outside it, so callers are served in
+    arrival order and the lock is held only for a read and a write. The state uses
+    the wall clock, which every process on the host agrees on.
+
+    Only processes of one host are coordinated: on network filesystems flock is
+    either local to each client or not supported, so workers on several hosts
+    would each get the full `rate`. Give each host its share of the rate instead.
+
+    """
+
+    _state = struct.Struct("dd")
+
+    def __init__(self, path, rate: float, capacity: float = 1):
+        if rate <= 0:
+            raise ValueError("The rate must be greater than zero.")
+        self.path = Path(path)
+        self.rate = rate
+        self.capacity = capacity
+        # flock excludes other processes; threads of this one share the descriptor, so they need a lock of their own.
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+
+    def _updating(self, change) -> float:
+        with self.lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                now = time.time()
+                data = os.pread(self._fd, self._state.size, 0)
+                tokens, updated = self._state.unpack(data) if len(data) == self._state.size else (self.capacity, now)
+                tokens = min(self.capacity, tokens + max(now - updated, 0) * self.rate)
+                tokens, wait = change(tokens)
+                os.pwrite(self._fd, self._state.pack(tokens, now), 0)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return wait
+
+    def acquire(self) -> float:
+        """
+        Takes one token, sleeping until it is available. Returns the time waited.
+
+        """
+        def taking(tokens):
+            tokens -= 1
+            return tokens, -tokens / self.rate if tokens < 0 else 0.0
+
+        wait = self._updating(taking)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        """
+        Holds back every caller of every process for at least `seconds`, as
+        TokenBucket.pause does: concurrent pauses do not add up.
+
+        """
+        self._updating(lambda tokens: (min(tokens, -seconds * self.rate), 0.0))
+
+    def close(self) -> None:
+        os.close(self._fd)
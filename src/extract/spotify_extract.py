@@ -2,20 +2,106 @@ import os
 import pandas as pd
 import logging
 
+from pandas.api.types import union_categoricals
+
+from utils.instrumentation import measuring_stage
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
 path = "../data/spotify_data.csv"
 
-def extracting_spotify_data(path):
+# Declared schema of the Spotify dataset. Every column but the "Unnamed: 0" index is read:
+# the transform drops "key", "loudness", "mode" and the like only after its dropna and
+# drop_duplicates, which look at all of them. Integer and boolean columns are read as
+# nullable types, so a missing value does not fail the read, and narrowed to the plain
+# NumPy type when they have none. Floats stay float64 because the transform compares
+# them against thresholds.
+SPOTIFY_SCHEMA = {
+    "track_id": "object",
+    "artists": "object",
+    "album_name": "object",
+    "track_name": "object",
+    "popularity": "Int16",
+    "duration_ms": "Int32",
+    "explicit": "boolean",
+    "danceability": "float64",
+    "energy": "float64",
+    "key": "Int8",
+    "loudness": "float64",
+    "mode": "Int8",
+    "speechiness": "float64",
+    "acousticness": "float64",
+    "instrumentalness": "float64",
+    "liveness": "float64",
+    "valence": "float64",
+    "tempo": "float64",
+    "time_signature": "Int8",
+    "track_genre": "category",
+}
+
+SPOTIFY_COLUMNS = list(SPOTIFY_SCHEMA)
+
+CHUNK_SIZE = int(os.getenv("SPOTIFY_CHUNK_SIZE", 0)) or None
+
+try:
+    import pyarrow  # noqa: F401
+    FAST_ENGINE = "pyarrow"
+except ImportError:
+    FAST_ENGINE = "c"
+
+
+def _concat_chunks(chunks):
+    """
+    Concatenates chunks whose categorical columns may have different categories.
+    
+    """
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame(columns=SPOTIFY_COLUMNS)
+    
+    for column, dtype in SPOTIFY_SCHEMA.items():
+        if dtype == "category" and column in chunks[0].columns:
+            categories = union_categoricals([chunk[column] for chunk in chunks]).categories
+            for chunk in chunks:
+                chunk[column] = chunk[column].cat.set_categories(categories)
+    
+    return pd.concat(chunks, ignore_index=True)
+
+def _narrowing(df):
+    """
+    Casts the nullable integer and boolean columns without missing values to their NumPy type.
+    
+    """
+    for column in df.columns:
+        dtype = df[column].dtype
+        if isinstance(dtype, pd.api.extensions.ExtensionDtype) and hasattr(dtype, "numpy_dtype") and not df[column].hasnans:
+            df[column] = df[column].astype(dtype.numpy_dtype)
+    return df
+
+@measuring_stage("extract_spotify")
+def extracting_spotify_data(path, columns=SPOTIFY_COLUMNS, chunksize=CHUNK_SIZE):
     """
     Extracting data from the Spotify CSV file and return it as a DataFrame.   
 
+    Only `columns` are read, with the compact dtypes declared in SPOTIFY_SCHEMA.
+    Pass columns=None to read every column. With `chunksize`, the file is streamed
+    in chunks of that many rows so the parser never holds the whole text in memory;
+    otherwise the fastest available engine (pyarrow) parses it in one go.
+
     """
     if not os.path.exists(path):
         raise FileNotFoundError(f"File not found: {path}. Make sure you entered the correct absolute path.")
     try:
-        df = pd.read_csv(path)
+        dtype = {column: SPOTIFY_SCHEMA[column] for column in columns} if columns else None
+        
+        if chunksize:
+            reader = pd.read_csv(path, usecols=columns, dtype=dtype, chunksize=chunksize)
+            df = _concat_chunks(reader)
+        else:
+            df = pd.read_csv(path, usecols=columns, dtype=dtype, engine=FAST_ENGINE)
+        df = _narrowing(df)
+        
         logging.info(f"Data extracted from {path}.")
         return df
     except Exception as e:
-        logging.error(f"Error extracting data: {e}.")
\ No newline at end of file
+        logging.error(f"Error extracting data: {e}.")
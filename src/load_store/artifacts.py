@@ -0,0 +1,175 @@
+from pathlib import Path
+from datetime import datetime
+import os
+import re
+import uuid
+
+import pandas as pd
+
+import logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+artifacts_dir = Path(os.getenv("ARTIFACTS_DIR", "./data/artifacts"))
+artifact_format = os.getenv("ARTIFACT_FORMAT", "parquet")
+# Artifacts kept per name; older ones are removed every time a new one is saved.
+artifacts_keep = int(os.getenv("ARTIFACTS_KEEP", 3))
+
+
+class ParquetBackend:
+    """
+    Stores DataFrames as Parquet files (columnar, compressed, keeps dtypes).
+
+    """
+    extension = ".parquet"
+
+    def write(self, df, path):
+        df.to_parquet(path, index=False)
+
+    def read(self, path):
+        return pd.read_parquet(path)
+
+
+class ArrowIPCBackend:
+    """
+    Stores DataFrames as Arrow IPC (Feather v2) files, the cheapest format to read back.
+
+    """
+    extension = ".arrow"
+
+    def write(self, df, path):
+        df.reset_index(drop=True).to_feather(path)
+
+    def read(self, path):
+        return pd.read_feather(path)
+
+
+backends = {
+    "parquet": ParquetBackend(),
+    "arrow": ArrowIPCBackend(),
+}
+
+
+def registering_backend(name, backend):
+    """
+    Registers a new artifact backend. The backend needs an `extension` attribute
+    and `write(df, path)` / `read(path)` methods.
+
+    """
+    backends[name] = backend
+
+
+def saving_artifact(df, name, fmt=None):
+    """
+    Writes a DataFrame to the artifact store and returns a small reference to it.
+
+    Parameters:
+        df (pd.DataFrame): The DataFrame to be stored.
+        name (str): A short name for the artifact (e.g. "spotify_clean").
+        fmt (str): Backend to use. Defaults to the ARTIFACT_FORMAT environment variable.
+
+    Returns:
+        dict: The reference (path, format, schema and row count), small enough for XCom.
+
+    """
+    fmt = fmt or artifact_format
+    backend = backends[fmt]
+
+    artifacts_dir.mkdir(parents=True, exist_ok=True)
+
+    stamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    path = artifacts_dir / f"{name}_{stamp}_{uuid.uuid4().hex[:8]}{backend.extension}"
+
+    backend.write(df, path)
+
+    logging.info(f"Artifact {name} written to {path} ({df.shape[0]} rows).")
+
+    sweeping_artifacts(name)
+
+    return {
+        "path": str(path.resolve()),
+        "format": fmt,
+        "schema": {column: str(dtype) for column, dtype in df.dtypes.items()},
+        "rows": int(df.shape[0]),
+    }
+
+
+def reading_artifact(ref):
+    """
+    Reads back the DataFrame referenced by `ref`, as returned by saving_artifact.
+
+    """
+    if ref is None:
+        raise ValueError("Received an empty artifact reference. The upstream task probably failed.")
+
+    df = backends[ref["format"]].read(ref["path"])
+
+    if df.shape[0] != ref["rows"]:
+        raise ValueError(f"Artifact {ref['path']} has {df.shape[0]} rows, expected {ref['rows']}.")
+
+    logging.info(f"Artifact read from {ref['path']} ({df.shape[0]} rows).")
+
+    return df
+
+
+def removing_artifact(ref):
+    """
+    Deletes the file behind an artifact reference, if it still exists.
+
+    """
+    if ref and os.path.exists(ref["path"]):
+        os.remove(ref["path"])
+        logging.info(f"Artifact {ref['path']} removed.")
+
+
+def _listing_artifacts(name):
+    # Artifacts saved under `name`, most recent first. The pattern keeps "api_raw" from matching "api_raw_shard_0".
+    pattern = re.compile(rf"{re.escape(name)}_\d{{14}}_[0-9a-f]{{8}}$")
+    extensions = {backend.extension for backend in backends.values()}
+    candidates = []
+    for path in artifacts_dir.glob(f"{name}_*"):
+        if path.suffix in extensions and pattern.match(path.stem):
+            try:
+                candidates.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+    return [path for _, path in sorted(candidates, reverse=True)]
+
+
+def sweeping_artifacts(name, keep=None):
+    """
+    Removes all but the `keep` most recent artifacts saved under `name`
+    (ARTIFACTS_KEEP by default), so the store does not grow with every run.
+
+    """
+    keep = artifacts_keep if keep is None else keep
+    for path in _listing_artifacts(name)[max(keep, 1):]:
+        path.unlink(missing_ok=True)
+        logging.info(f"Artifact {path} removed.")
+
+
+def finding_latest_artifact(name):
+    """
+    Path of the most recent artifact saved under `name`, or None.
+
+    """
+    candidates = _listing_artifacts(name)
+    return candidates[0] if candidates else None
+
+
+def reading_latest_artifact(name):
+    """
+    Reads back the most recent artifact saved under `name` (e.g. "spotify_clean"),
+    whatever run or process wrote it.
+
+    """
+    path = finding_latest_artifact(name)
+
+    if path is None:
+        raise FileNotFoundError(f"No artifact named {name} in {artifacts_dir}.")
+
+    extensions = {backend.extension: fmt for fmt, backend in backends.items()}
+    df = backends[extensions[path.suffix]].read(path)
+
+    logging.info(f"Artifact read from {path} ({df.shape[0]} rows).")
+
+    return df
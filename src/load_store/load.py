@@ -1,21 +1,30 @@
-from db.db_operations import creating_engine, load_clean_data, disposing_engine
+from db.db_operations import getting_engine, load_clean_data
 
 import pandas as pd
 import logging
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+# Natural key of the merged data: a Spotify track and the Grammy nomination it was matched with.
+MERGED_DATA_KEY = ["track_id", "title", "category"]
+
 # Loading the merged data to the database
-def loading_merged_data(df: pd.DataFrame, table_name: str) -> None:
+def loading_merged_data(df: pd.DataFrame, table_name: str, mode: str = "replace", key: list = MERGED_DATA_KEY) -> None:
     """
     This function takes a merged DataFrame and a table name as input, 
     and loads the DataFrame into the specified table in the database. 
     It logs the process and handles any exceptions that occur during 
     the loading process.
     
+    By default the table's rows are replaced, so every run refreshes the table
+    instead of skipping it when it already exists. The "upsert" mode merges the
+    rows on `key` instead; it needs a table with no other primary key than `key`.
+    
     Parameters:
         df (pd.DataFrame): The merged DataFrame to be loaded into the database.
         table_name (str): The name of the table where the data will be loaded.
+        mode (str): "create", "append", "replace" or "upsert" (see load_clean_data).
+        key (list): Columns of the natural key used by the upsert mode.
     
     Returns:
         None
@@ -24,11 +33,9 @@ def loading_merged_data(df: pd.DataFrame, table_name: str) -> None:
     
     logging.info("Loading clean data to the database.")
     
-    engine = creating_engine()
+    engine = getting_engine()
     
     try:
-        df = load_clean_data(engine, df, table_name)    
+        load_clean_data(engine, df, table_name, mode=mode, key=key)
     except Exception as e:
-        logging.error(f"Error loading clean data to the database: {e}.")
-    finally:
-        disposing_engine(engine)
\ No newline at end of file
+        logging.error(f"Error loading clean data to the database: {e}.")
\ No newline at end of file
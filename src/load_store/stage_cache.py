@@ -0,0 +1,291 @@
+from pathlib import Path
+from functools import lru_cache
+import os
+import json
+import time
+import ast
+import fcntl
+import inspect
+import hashlib
+import importlib.util
+
+import pandas as pd
+
+from load_store.artifacts import backends, artifact_format, reading_artifact, finding_latest_artifact, reading_latest_artifact
+
+import logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+cache_dir = Path(os.getenv("STAGE_CACHE_DIR", "./data/stage_cache"))
+cache_max_bytes = int(os.getenv("STAGE_CACHE_MAX_BYTES", 2 * 2**30))
+# Entries used this recently are never evicted: a run still in progress may read them later.
+cache_protect_seconds = float(os.getenv("STAGE_CACHE_PROTECT_SECONDS", 6 * 60 * 60))
+# "all" (or "1") recomputes every memoized stage; a comma-separated list recomputes only those stages.
+cache_force = os.getenv("STAGE_CACHE_FORCE", "")
+
+# Modules under this directory (src/) are part of the code version of the stages that import them.
+source_root = Path(__file__).resolve().parents[1]
+
+
+def fingerprinting(*parts):
+    """
+    Stable hash of any JSON-serializable values.
+
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def fingerprinting_file(path):
+    """
+    Fingerprint of a file from its metadata (size and modification time), without reading it.
+
+    """
+    stat = os.stat(path)
+    return {"path": str(Path(path).resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def fingerprinting_dataframe(df):
+    """
+    Fingerprint of the content of a DataFrame: its columns, dtypes and row hashes.
+
+    """
+    rows = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    schema = [(str(name), str(dtype)) for name, dtype in df.dtypes.items()]
+    return fingerprinting(schema, hashlib.sha256(rows.tobytes()).hexdigest())
+
+
+# Both are cached by modification time as well as path, so a file edited while the process
+# runs (a long-lived Airflow worker, say) is read again.
+@lru_cache(maxsize=None)
+def _hashing_source(path, mtime_ns):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def _importing(path, mtime_ns):
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), filename=path)
+
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            # "from package import module" imports a module too.
+            names += [node.module] + [f"{node.module}.{alias.name}" for alias in node.names]
+
+    files = set()
+    for name in names:
+        try:
+            spec = importlib.util.find_spec(name)
+        except (ImportError, ValueError):
+            continue
+        if spec is not None and spec.has_location and source_root in Path(spec.origin).resolve().parents:
+            files.add(str(Path(spec.origin).resolve()))
+    return frozenset(files)
+
+
+def code_version(*functions):
+    """
+    Version of the code of a stage: a hash of the source files defining `functions`
+    (decorators unwrapped) and of every module of this project they import, directly
+    or not (utils/normalization.py for the merge, say). Editing any of those files
+    invalidates the cached outputs.
+
+    """
+    pending = [inspect.getsourcefile(inspect.unwrap(function)) for function in functions]
+    hashes = {}
+    while pending:
+        path = str(Path(pending.pop()).resolve())
+        if path in hashes:
+            continue
+        mtime_ns = os.stat(path).st_mtime_ns
+        hashes[path] = _hashing_source(path, mtime_ns)
+        pending += _importing(path, mtime_ns)
+    return fingerprinting([hashes[path] for path in sorted(hashes)])
+
+
+def _forcing(stage):
+    forced = {name.strip() for name in cache_force.split(",") if name.strip()}
+    return bool(forced & {"all", "1", stage})
+
+
+class StageCache:
+    """
+    Content-addressed store of stage outputs.
+
+    Each entry is the output of one stage for one fingerprint of its inputs and code,
+    written with an artifact backend (Parquet by default) plus a small JSON file with
+    its artifact reference. Reading an entry refreshes its modification time, and
+    once the store grows over `max_bytes` the least recently used entries are evicted,
+    except those used in the last `protect_seconds`.
+
+    The entry each stage returned last is also pointed to from latest/<stage>.json,
+    so other tools (src/pipeline.py) can read the latest output of a stage without
+    knowing its key. Those entries are never evicted.
+
+    """
+
+    def __init__(self, directory=None, max_bytes=None, fmt=None, protect_seconds=None):
+        self.directory = Path(directory or cache_dir)
+        self.max_bytes = cache_max_bytes if max_bytes is None else max_bytes
+        self.fmt = fmt or artifact_format
+        self.protect_seconds = cache_protect_seconds if protect_seconds is None else protect_seconds
+
+    def _paths(self, stage, key):
+        base = self.directory / f"{stage}-{key[:32]}"
+        return base.with_suffix(".json"), base.with_suffix(backends[self.fmt].extension)
+
+    def pointing(self, stage, ref):
+        """
+        Records `ref` as the latest output of `stage`.
+
+        """
+        latest_dir = self.directory / "latest"
+        latest_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = latest_dir / f"{stage}.{os.getpid()}.tmp.json"
+        tmp_path.write_text(json.dumps(ref), encoding="utf-8")
+        os.replace(tmp_path, latest_dir / f"{stage}.json")
+
+    def latest(self, stage):
+        """
+        Returns (time it was recorded, artifact reference) of the latest output of `stage`, or None.
+
+        """
+        path = self.directory / "latest" / f"{stage}.json"
+        try:
+            with open(path, encoding="utf-8") as f:
+                return os.fstat(f.fileno()).st_mtime, json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def looking_up(self, stage, key):
+        """
+        Returns the artifact reference cached for (`stage`, `key`), or None.
+
+        """
+        meta_path, data_path = self._paths(stage, key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                ref = json.load(f)
+            os.utime(data_path)
+            os.utime(meta_path)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        return ref
+
+    def storing(self, stage, key, df):
+        """
+        Caches `df` as the output of `stage` for `key` and returns its artifact reference.
+
+        The reference carries the fingerprint of the content, not `key`: a stage that
+        reran (its source was touched, say) but produced the same output leaves the
+        keys of the stages downstream unchanged, so those are still reused.
+
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        meta_path, data_path = self._paths(stage, key)
+
+        # Written under temporary names and renamed, so a reader never sees half an entry.
+        tmp_path = data_path.with_name(f"{data_path.stem}.{os.getpid()}.tmp{data_path.suffix}")
+        backends[self.fmt].write(df, tmp_path)
+        os.replace(tmp_path, data_path)
+
+        ref = {
+            "path": str(data_path.resolve()),
+            "format": self.fmt,
+            "schema": {column: str(dtype) for column, dtype in df.dtypes.items()},
+            "rows": int(df.shape[0]),
+            "fingerprint": fingerprinting_dataframe(df),
+        }
+        tmp_path = meta_path.with_name(f"{meta_path.stem}.{os.getpid()}.tmp.json")
+        tmp_path.write_text(json.dumps(ref), encoding="utf-8")
+        os.replace(tmp_path, meta_path)
+
+        self.evicting(keep=meta_path)
+        return ref
+
+    def evicting(self, keep=None):
+        """
+        Removes the least recently used entries until the store fits in `max_bytes`.
+        The entry of `keep` (the one just written), the latest one of each stage and the
+    recently used ones are never removed.
+
+        """
+        protected_since = time.time() - self.protect_seconds
+        pointed = set()
+        for pointer in (self.directory / "latest").glob("*.json"):
+            try:
+                pointed.add(str(Path(json.loads(pointer.read_text(encoding="utf-8"))["path"]).resolve()))
+            except (FileNotFoundError, json.JSONDecodeError, KeyError):
+                continue
+        with open(self.directory / ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = []
+            for meta_path in self.directory.glob("*.json"):
+                if ".tmp" in meta_path.name:
+                    continue
+                files = [path for path in self.directory.glob(f"{meta_path.stem}.*") if ".tmp" not in path.name]
+                try:
+                    kept = meta_path == keep or any(str(path.resolve()) in pointed for path in files)
+                    entries.append((meta_path.stat().st_mtime, sum(path.stat().st_size for path in files), files, kept))
+                except FileNotFoundError:
+                    continue
+
+            total = sum(size for _, size, _, _ in entries)
+            for used_at, size, files, kept in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                if kept or used_at >= protected_since:
+                    continue
+                for path in files:
+                    path.unlink(missing_ok=True)
+                total -= size
+                logging.info(f"Stage cache entry {files[0].stem} evicted ({size} bytes).")
+
+            if total > self.max_bytes:
+                logging.warning(f"Stage cache holds {total} bytes, over its {self.max_bytes} byte limit, "
+                                f"in entries used in the last {self.protect_seconds:.0f} s.")
+
+
+def memoizing(stage, key, computing, cache=None):
+    """
+    Returns the artifact reference of the output of `stage` for the fingerprint `key`.
+
+    If the stage cache has it (and STAGE_CACHE_FORCE does not name the stage), the
+    cached reference is returned without running anything. Otherwise `computing()`
+    produces the DataFrame, which is cached. A `key` of None disables the lookup for
+    this call; the output is still stored, under its content fingerprint.
+
+    """
+    cache = cache or StageCache()
+
+    if key is not None and not _forcing(stage):
+        ref = cache.looking_up(stage, key)
+        if ref is not None:
+            logging.info(f"Stage {stage}: inputs unchanged, reusing {ref['path']} ({ref['rows']} rows).")
+            cache.pointing(stage, ref)
+            return ref
+
+    df = computing()
+    ref = cache.storing(stage, key or fingerprinting_dataframe(df), df)
+    cache.pointing(stage, ref)
+    return ref
+
+
+def reading_latest_output(stage, cache=None):
+    """
+    Reads back the latest output of `stage` (e.g. "spotify_clean"): the one the DAG
+    last memoized in the stage cache or the latest artifact saved under that name
+    (src/pipeline.py --save-artifacts), whichever was written last.
+
+    """
+    cache = cache or StageCache()
+    latest = cache.latest(stage)
+    path = finding_latest_artifact(stage)
+
+    if latest is not None and (path is None or latest[0] >= path.stat().st_mtime):
+        return reading_artifact(latest[1])
+    return reading_latest_artifact(stage)
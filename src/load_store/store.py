@@ -1,14 +1,26 @@
 
 from pydrive2.auth import GoogleAuth
 from pydrive2.drive import GoogleDrive
+from googleapiclient.http import MediaFileUpload
+from googleapiclient.errors import HttpError
+from httplib2 import HttpLib2Error
 
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import io
+import gzip
+import hashlib
+import tempfile
+import random
+import time
 
 import pandas as pd
 
+from load_store.artifacts import backends
+
 import logging
+from utils.instrumentation import counting, measuring_stage
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
 env_path = Path(__file__).parent.resolve() / ".env"
@@ -21,6 +33,21 @@ settings_file = config_dir / "settings.yaml"
 credentials_file = config_dir / "saved_credentials.json"
 folder_id = os.getenv("FOLDER_ID")
 
+export_format = os.getenv("DRIVE_EXPORT_FORMAT", "csv.gz")
+upload_chunk_size = int(os.getenv("DRIVE_UPLOAD_CHUNK_SIZE", 8 * 1024 * 1024))
+upload_retries = int(os.getenv("DRIVE_UPLOAD_RETRIES", 5))
+
+CSV_CHUNK_ROWS = 50000
+HASH_BLOCK_SIZE = 1024 * 1024
+
+mime_types = {
+    "csv": "text/csv",
+    "csv.gz": "application/gzip",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+_drive = None
+
 def auth_drive():
     """
     Authenticates and returns a Google Drive instance using the PyDrive library.
@@ -67,34 +94,163 @@ def auth_drive():
         logging.error(f"Authentication error: {e}", exc_info=True)
 
 
-def storing_merged_data(title, df):
+def getting_drive():
     """
-    Stores a given DataFrame as a CSV file on Google Drive.
+    Returns the authenticated GoogleDrive instance shared by every upload of this
+    process, authenticating only the first time and refreshing the token when it expires.
+    The Drive API client (`drive.auth.service`) is built here, before any request uses it.
     
-    Parameters:
-        title (str): The title of the file to be stored on Google Drive.
-        df (pandas.DataFrame): The DataFrame to be stored as a CSV file.
-        folder_id (str): The ID of the Google Drive folder where the file will be stored.
+    Raises:
+        RuntimeError: If the authentication failed; the next call tries again.
+    
+    """
+    global _drive
+    
+    if _drive is None:
+        drive = auth_drive()
+        if drive is None:
+            raise RuntimeError("Google Drive authentication failed, nothing was uploaded.")
+        _drive = drive
+    elif _drive.auth.access_token_expired:
+        logging.info("Access token expired, refreshing token.")
+        _drive.auth.Refresh()
+    
+    if _drive.auth.service is None:
+        _drive.auth.Authorize()
+    
+    return _drive
+
+
+def writing_export(df, path, fmt):
+    """
+    Writes the DataFrame to `path` as a CSV, a gzip-compressed CSV or a Parquet file.
+    The CSV is streamed to disk in chunks of rows, so the whole text is never held in memory.
+    The gzip header carries no name or timestamp: the same data always gives the same bytes.
+    
+    """
+    if fmt == "csv":
+        with open(path, "w", encoding="utf-8", newline="") as text:
+            df.to_csv(text, index=False, chunksize=CSV_CHUNK_ROWS)
+    elif fmt == "csv.gz":
+        with open(path, "wb") as raw, gzip.GzipFile(filename="", fileobj=raw, mode="wb", mtime=0) as compressed, \
+                io.TextIOWrapper(compressed, encoding="utf-8", newline="") as text:
+            df.to_csv(text, index=False, chunksize=CSV_CHUNK_ROWS)
+    elif fmt == "parquet":
+        backends["parquet"].write(df, path)
+    else:
+        raise ValueError(f"Unknown export format: {fmt}. Use 'csv', 'csv.gz' or 'parquet'.")
+
+
+def hashing_file(path):
+    """
+    MD5 of a file, read in blocks. Drive reports the same checksum (md5Checksum) for uploaded files.
+    
+    """
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finding_uploaded_file(drive, title):
+    """
+    Returns the metadata of the file called `title` in the export folder, or None.
+    
+    """
+    counting("http_requests")
+    files = drive.ListFile({
+        "q": f"'{folder_id}' in parents and title = '{title}' and trashed = false"
+    }).GetList()
+    return files[0] if files else None
+
+
+def uploading_file(drive, path, title, mime_type, file_id=None):
+    """
+    Uploads `path` with a resumable upload sent in chunks of DRIVE_UPLOAD_CHUNK_SIZE bytes.
+    Failed chunks are retried from the last byte Drive acknowledged. With `file_id` the
+    existing file gets a new revision instead of a new file being created.
+    
+    The retries are done here and not with next_chunk(num_retries=...): that one resends
+    the part of the file it already read, so a retried chunk arrives empty.
     
     Returns:
-        None
+        dict: The metadata of the uploaded file.
     
     """
+    media = MediaFileUpload(str(path), mimetype=mime_type, chunksize=upload_chunk_size, resumable=True)
+    files = drive.auth.service.files()
     
-    drive = auth_drive()
+    if file_id:
+        request = files.update(fileId=file_id, media_body=media, supportsAllDrives=True)
+    else:
+        body = {
+            "title": title,
+            "parents": [{"kind": "drive#fileLink", "id": folder_id}],
+            "mimeType": mime_type
+        }
+        request = files.insert(body=body, media_body=media, supportsAllDrives=True)
     
-    logging.info(f"Storing {title} on Google Drive.")
+    response, failures = None, 0
+    while response is None:
+        counting("http_requests")
+        try:
+            status, response = request.next_chunk()
+        except (HttpError, HttpLib2Error, OSError) as e:
+            retriable = not isinstance(e, HttpError) or e.resp.status >= 500 or e.resp.status == 429
+            if not retriable or failures >= upload_retries:
+                raise
+            failures += 1
+            logging.warning(f"Upload of {title} failed ({e}), retry {failures} of {upload_retries}.")
+            # The next call asks Drive how many bytes it kept and resumes from there.
+            time.sleep(random.random() * 2 ** failures)
+            continue
+        failures = 0
+        if status:
+            logging.info(f"Uploaded {status.progress():.0%} of {title}.")
     
-    csv_file = df.to_csv(index=False) 
+    return response
+
+
+@measuring_stage("store")
+def storing_merged_data(title, df, fmt=None):
+    """
+    Stores a given DataFrame on Google Drive as a CSV, a gzip-compressed CSV or a Parquet file.
     
-    file = drive.CreateFile({
-        "title": title,
-        "parents": [{"kind": "drive#fileLink", "id": folder_id}],
-        "mimeType": "text/csv"
-    })
+    The file is written to a temporary directory and uploaded from disk in resumable
+    chunks. If the folder already has a file with the same title and the same content
+    (same MD5), nothing is uploaded; if the content changed, the file gets a new revision.
     
-    file.SetContentString(csv_file)
+    Parameters:
+        title (str): The title of the file on Google Drive, without extension.
+        df (pandas.DataFrame): The DataFrame to be stored.
+        fmt (str): "csv", "csv.gz" or "parquet". Defaults to the DRIVE_EXPORT_FORMAT environment variable.
+            The format is the extension of the title: "merged_data" is stored as merged_data.csv.gz by default.
+    
+    Returns:
+        dict: The metadata of the file on Drive (the existing one when the upload was skipped).
+    
+    """
+    
+    fmt = fmt or export_format
+    drive = getting_drive()
+    title = f"{title}.{fmt}"
+    
+    logging.info(f"Storing {title} on Google Drive.")
+    
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / title
+        writing_export(df, path, fmt)
+        checksum = hashing_file(path)
+        
+        uploaded = finding_uploaded_file(drive, title)
+        if uploaded is not None and uploaded.get("md5Checksum") == checksum:
+            logging.info(f"File {title} is unchanged on Google Drive (md5 {checksum}), skipping upload.")
+            return uploaded
+        
+        size = path.stat().st_size
+        metadata = uploading_file(drive, path, title, mime_types[fmt], uploaded["id"] if uploaded else None)
     
-    file.Upload()
+    logging.info(f"File {title} uploaded successfully ({size} bytes, md5 {checksum}).")
     
-    logging.info(f"File {title} uploaded successfully.")
+    return metadata
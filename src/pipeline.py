@@ -0,0 +1,222 @@
+"""
+Runs the whole ETL pipeline in one process, without Airflow.
+
+The stages are the ones of the workshop_2 DAG, but the DataFrames are passed in
+memory instead of through artifacts. The three extract -> transform branches
+(MusicBrainz API, Spotify, Grammys) run concurrently; merge, load and store run
+after them. A stage left out with --only/--skip whose output is still needed is
+read back from its latest output: the one the DAG last memoized in STAGE_CACHE_DIR
+or the latest artifact written by --save-artifacts, whichever is newer.
+
+Usage:
+    python src/pipeline.py                                  # everything
+    python src/pipeline.py --skip store                     # no upload to Google Drive
+    python src/pipeline.py --only extract --save-artifacts  # extract and keep the raw data
+    python src/pipeline.py --only transform merge           # reuse the last raw artifacts
+    python src/pipeline.py --executor process --json data/metrics/pipeline.json
+
+"""
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import argparse
+import logging
+import json
+import time
+import sys
+
+import pandas as pd
+
+from extract.api_extract import extract_musicbrainz
+from extract.spotify_extract import extracting_spotify_data
+from extract.grammys_extract import extracting_grammys_data
+
+from transform.api_transform import transform_artist_data
+from transform.spotify_transform import transforming_spotify_data
+from transform.grammys_transform import transforming_grammys_data
+from transform.merge import merging_datasets
+
+from load_store.load import loading_merged_data
+from load_store.store import storing_merged_data
+from load_store.artifacts import saving_artifact
+from load_store.stage_cache import reading_latest_output
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+SPOTIFY_PATH = "./data/spotify_dataset.csv"
+TABLE_NAME = "merged_data"
+
+# stage: (function, upstream stages, artifact name used by the DAG)
+stages = {
+    "extract_api": (lambda: extract_musicbrainz(), [], "api_raw"),
+    "extract_spotify": (lambda: extracting_spotify_data(SPOTIFY_PATH), [], "spotify_raw"),
+    "extract_grammys": (lambda: extracting_grammys_data(), [], "grammys_raw"),
+    "transform_api": (transform_artist_data, ["extract_api"], "api_clean"),
+    "transform_spotify": (transforming_spotify_data, ["extract_spotify"], "spotify_clean"),
+    "transform_grammys": (transforming_grammys_data, ["extract_grammys"], "grammys_clean"),
+    "merge": (merging_datasets, ["transform_api", "transform_spotify", "transform_grammys"], "merged"),
+    "load": (lambda df: loading_merged_data(df, TABLE_NAME), ["merge"], None),
+    "store": (lambda df: storing_merged_data(TABLE_NAME, df), ["merge"], None),
+}
+
+branches = {
+    "api": ["extract_api", "transform_api"],
+    "spotify": ["extract_spotify", "transform_spotify"],
+    "grammys": ["extract_grammys", "transform_grammys"],
+}
+
+groups = {
+    "extract": ["extract_api", "extract_spotify", "extract_grammys"],
+    "transform": ["transform_api", "transform_spotify", "transform_grammys"],
+    **branches,
+}
+
+
+def selecting_stages(only=None, skip=None):
+    """
+    The stages to run, in pipeline order. `only` and `skip` take stage names or
+    the groups "extract", "transform", "api", "spotify" and "grammys".
+
+    """
+    def expanding(names):
+        expanded = set()
+        for name in names or []:
+            if name not in stages and name not in groups:
+                raise ValueError(f"Unknown stage {name}. Use one of: {', '.join(list(stages) + list(groups))}.")
+            expanded.update(groups.get(name, [name]))
+        return expanded
+
+    selected = expanding(only) if only else set(stages)
+    selected -= expanding(skip)
+    return [stage for stage in stages if stage in selected]
+
+
+def _running_stages(names, selected, inputs, save_artifacts):
+    """
+    Runs the selected stages among `names` in order. The input of each one is the
+    output of its upstream stages, taken from `inputs` (and updated with every output),
+    or read back from its latest output when the upstream stage was not selected.
+
+    Returns ({stage: output}, [timing record]).
+
+    """
+    outputs, timings = {}, []
+
+    for stage in names:
+        if stage not in selected:
+            continue
+        function, upstream, artifact = stages[stage]
+
+        arguments = []
+        for dependency in upstream:
+            if dependency not in inputs:
+                logging.info(f"Stage {dependency} is not selected, reading its latest output.")
+                start = time.perf_counter()
+                inputs[dependency] = reading_latest_output(stages[dependency][2])
+                timings.append({"stage": dependency, "status": "reused", "seconds": time.perf_counter() - start,
+                                "rows": len(inputs[dependency])})
+            arguments.append(inputs[dependency])
+
+        start = time.perf_counter()
+        result = function(*arguments)
+        seconds = time.perf_counter() - start
+
+        if save_artifacts and artifact and isinstance(result, pd.DataFrame):
+            saving_artifact(result, artifact)
+
+        outputs[stage] = inputs[stage] = result
+        timings.append({"stage": stage, "status": "run", "seconds": seconds,
+                        "rows": len(result) if isinstance(result, pd.DataFrame) else None})
+
+    return outputs, timings
+
+
+def running_pipeline(selected, executor="thread", save_artifacts=False):
+    """
+    Runs `selected` stages: the three branches concurrently, then merge, load and store.
+
+    Parameters:
+        selected (list): Stages to run, as returned by selecting_stages.
+        executor (str): "thread" keeps every DataFrame in this process; "process" runs
+            each branch in its own process (parallel CPU work, but its output is pickled back).
+        save_artifacts (bool): Also write each stage output as an artifact, as the DAG does.
+
+    Returns:
+        dict: The per-stage timing records, the wall time of each branch and of the whole run.
+
+    """
+    started_at, started = datetime.now().isoformat(timespec="seconds"), time.perf_counter()
+    outputs, timings, branch_seconds = {}, [], {}
+    running = [name for name, names in branches.items() if set(names) & set(selected)]
+
+    pool = ThreadPoolExecutor if executor == "thread" else ProcessPoolExecutor
+    with pool(max_workers=max(len(running), 1)) as workers:
+        futures = {name: workers.submit(_timing_branch, branches[name], selected, save_artifacts) for name in running}
+        for name, future in futures.items():
+            branch_outputs, branch_timings, branch_seconds[name] = future.result()
+            outputs.update(branch_outputs)
+            timings += branch_timings
+
+    final_outputs, final_timings = _running_stages(["merge", "load", "store"], selected, outputs, save_artifacts)
+    timings += final_timings
+
+    return {
+        "started_at": started_at,
+        "executor": executor,
+        "stages": timings,
+        "branches": branch_seconds,
+        "wall_seconds": time.perf_counter() - started,
+    }
+
+
+def _timing_branch(names, selected, save_artifacts):
+    start = time.perf_counter()
+    outputs, timings = _running_stages(names, selected, {}, save_artifacts)
+    # Only the last output of the branch is needed downstream; the rest is not sent back.
+    last = names[-1]
+    return {last: outputs[last]} if last in outputs else {}, timings, time.perf_counter() - start
+
+
+def printing_report(report):
+    print(f"\n{'stage':<20} {'status':<8} {'seconds':>9} {'rows':>10}")
+    for record in sorted(report["stages"], key=lambda record: list(stages).index(record["stage"])):
+        rows = "" if record["rows"] is None else record["rows"]
+        print(f"{record['stage']:<20} {record['status']:<8} {record['seconds']:>9.2f} {rows:>10}")
+    for name, seconds in report["branches"].items():
+        print(f"{'branch ' + name:<20} {'':<8} {seconds:>9.2f}")
+    stage_total = sum(record["seconds"] for record in report["stages"])
+    print(f"{'total':<20} {report['executor']:<8} {report['wall_seconds']:>9.2f}   ({stage_total:.2f} s of stage time)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", metavar="STAGE", help="Run only these stages or groups.")
+    parser.add_argument("--skip", nargs="+", metavar="STAGE", help="Leave out these stages or groups.")
+    parser.add_argument("--executor", choices=["thread", "process"], default="thread",
+                        help="Pool the three extract/transform branches run on.")
+    parser.add_argument("--save-artifacts", action="store_true", help="Write every stage output as an artifact.")
+    parser.add_argument("--json", help="Also write the timing report to this file.")
+    args = parser.parse_args()
+
+    try:
+        selected = selecting_stages(args.only, args.skip)
+    except ValueError as e:
+        parser.error(str(e))
+    if not selected:
+        parser.error("No stage left to run.")
+
+    logging.info(f"Running stages: {', '.join(selected)}.")
+    try:
+        report = running_pipeline(selected, args.executor, args.save_artifacts)
+    except Exception as e:
+        logging.error(f"Pipeline failed: {e}")
+        sys.exit(1)
+
+    printing_report(report)
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.json).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,11 @@
 import pandas as pd
 import logging
 
+from utils.instrumentation import measuring_stage
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+@measuring_stage("transform_api")
 def transform_artist_data(df_input):
     if df_input.empty:
         logging.warning("El DataFrame de entrada está vacío. No se aplicarán transformaciones.")
@@ -0,0 +1,138 @@
+import re
+import logging
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+import pandas as pd
+
+from utils.normalization import normalizing_name
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+NGRAM_SIZE = 3
+MAX_BLOCK_SIZE = 2000
+MAX_CANDIDATES = 10
+MIN_SHARED_NGRAMS = 0.5
+MIN_SCORE = 0.88
+
+# A featuring credit only counts after the artist name, so names such as "Ft Island" are kept.
+featuring_pattern = re.compile(r"(?<=\S)(?:\s+[\(\[]?|[\(\[])(?:feat\.?|ft\.?|featuring)\s.*$")
+leading_article_pattern = re.compile(r"^the\s+")
+# Any script's letters and digits are kept, so non-Latin names are matched too.
+non_alphanumeric_pattern = re.compile(r"[\W_]+")
+
+
+def normalizing_for_matching(name):
+    """
+    Reduces an artist name to the form compared by the fuzzy matcher: the shared
+    key form (no accents, casefolded, "&" as "and") without a leading "The",
+    trailing featuring credits or punctuation.
+
+    """
+    name = normalizing_name(name)
+    if not name:
+        return ""
+    name = featuring_pattern.sub("", name)
+    name = non_alphanumeric_pattern.sub(" ", name).strip()
+    name = leading_article_pattern.sub("", name)
+    return name
+
+
+def ngrams(text, size=NGRAM_SIZE):
+    padded = f" {text} "
+    return {padded[i:i + size] for i in range(max(len(padded) - size + 1, 1))}
+
+
+class BlockingIndex:
+    """
+    Character n-gram blocking index over a list of names.
+
+    Every name is filed under each of its n-grams. A query only gets compared with
+    the names that share the most n-grams with it (its candidate block), never with
+    the whole list, so matching N queries against M names costs roughly O(N + M)
+    instead of O(N x M). N-grams shared by more than `max_block_size` names carry
+    almost no information and are left out of the index.
+
+    """
+
+    def __init__(self, names, ngram_size=NGRAM_SIZE, max_block_size=MAX_BLOCK_SIZE):
+        self.ngram_size = ngram_size
+        self.names = list(dict.fromkeys(name for name in names if name))
+        self.positions = {name: position for position, name in enumerate(self.names)}
+        self.normalized = [normalizing_for_matching(name) for name in self.names]
+
+        self.exact = {}
+        for position, normalized in enumerate(self.normalized):
+            self.exact.setdefault(normalized, position)
+
+        blocks = defaultdict(list)
+        for position, normalized in enumerate(self.normalized):
+            for gram in ngrams(normalized, ngram_size):
+                blocks[gram].append(position)
+        self.blocks = {gram: positions for gram, positions in blocks.items() if len(positions) <= max_block_size}
+
+    def candidates(self, normalized, limit=MAX_CANDIDATES, min_shared=MIN_SHARED_NGRAMS):
+        """
+        Positions of the names sharing the most n-grams with `normalized`, best first.
+        Names sharing less than `min_shared` of the query n-grams are not candidates.
+
+        """
+        grams = ngrams(normalized, self.ngram_size)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.blocks.get(gram, ()))
+        needed = min_shared * len(grams)
+        return [position for position, count in shared.most_common(limit) if count >= needed]
+
+    def matching(self, name, min_score=MIN_SCORE):
+        """
+        Returns (matched name, score) for `name`, or (None, 0.0) if nothing scores at least `min_score`.
+
+        """
+        if name in self.positions:
+            return name, 1.0
+        normalized = normalizing_for_matching(name)
+        if not normalized:
+            return None, 0.0
+        if normalized in self.exact:
+            return self.names[self.exact[normalized]], 1.0
+
+        candidates = self.candidates(normalized)
+        if not candidates:
+            return None, 0.0
+
+        # SequenceMatcher caches its second sequence, so the query goes there and is analysed once.
+        matcher = SequenceMatcher(None, b=normalized)
+        best, best_score = None, 0.0
+        for position in candidates:
+            matcher.set_seq1(self.normalized[position])
+            # The quick ratios are cheap upper bounds of ratio(); most candidates stop there.
+            if matcher.real_quick_ratio() < min_score or matcher.quick_ratio() < min_score:
+                continue
+            score = matcher.ratio()
+            if score > best_score:
+                best, best_score = position, score
+
+        if best is None or best_score < min_score:
+            return None, 0.0
+        return self.names[best], best_score
+
+
+def matching_names(queries: pd.Series, names, min_score=MIN_SCORE) -> pd.Series:
+    """
+    Maps every value of `queries` to its best match among `names` (or NaN).
+    Each distinct query is scored once, however many rows repeat it.
+
+    """
+    index = BlockingIndex(names)
+    distinct = queries.dropna().unique()
+
+    matches = {}
+    for query in distinct:
+        match, _ = index.matching(query, min_score)
+        if match is not None:
+            matches[query] = match
+
+    logging.info(f"Fuzzy matching: {len(matches)} of {len(distinct)} distinct names matched "
+                 f"against {len(index.names)} candidates.")
+    return queries.map(matches)
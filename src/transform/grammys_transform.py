@@ -2,6 +2,8 @@ import pandas as pd
 import re
 import logging
 
+from utils.instrumentation import measuring_stage
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
 
@@ -80,7 +82,52 @@ roles_of_interest = [
     "ensembles"
 ]
 
+# Patterns compiled once for the vectorized resolution (same expressions as the row-wise helpers above).
+parentheses_pattern = re.compile(r'\((.*?)\)')
+separators_pattern = re.compile(r'[;,]')
+any_role_pattern = re.compile('|'.join(re.escape(role) for role in roles_of_interest))
+roles_pattern = re.compile(r'([^;]+)\s*,\s*(?:' + '|'.join(roles_of_interest) + r')', flags=re.IGNORECASE)
+
+
+def resolving_artists(df):
+    """
+    Fills the missing values of 'artist' from 'workers' in a single vectorized stage.
+    
+    Applies, in order, the same rules as extract_artist, move_workers_to_artist,
+    extract_artists_before_semicolon and extract_roles_based_on_interest. Every rule
+    only looks at the rows that are still unresolved after the previous one.
+    
+    """
+    # Positional index so the masked assignments below are safe even if df has repeated labels.
+    # As object, so names can be assigned and .str works when a column is all missing (float64).
+    artist = df["artist"].reset_index(drop=True).astype(object)
+    workers = df["workers"].reset_index(drop=True).astype(object)
+    
+    # 1. Name between parentheses.
+    pending = artist.isna() & workers.notna()
+    artist[pending] = workers[pending].str.extract(parentheses_pattern, expand=False)
+    
+    # 2. The whole 'workers' value when it is a single name (no ';' nor ',').
+    pending = artist.isna() & workers.notna()
+    single = ~workers[pending].str.contains(separators_pattern).astype(bool)
+    artist[single[single].index] = workers[single[single].index]
+    
+    # 3. First segment before ';' when it has no ',' and mentions no role of interest.
+    pending = artist.isna() & workers.notna()
+    first_part = workers[pending].str.split(';').str[0].str.strip()
+    valid = ~first_part.str.contains(',', regex=False) & ~first_part.str.lower().str.contains(any_role_pattern)
+    artist[valid[valid].index] = first_part[valid]
+    
+    # 4. Names followed by one of the roles of interest.
+    pending = artist.isna() & workers.notna()
+    matches = workers[pending].str.findall(roles_pattern)
+    found = matches.str.len() > 0
+    artist[found[found].index] = matches[found].str.join(", ").str.strip()
+    
+    return pd.Series(artist.values, index=df.index, name="artist")
+
 
+@measuring_stage("transform_grammys")
 def transforming_grammys_data(df):
     """
     Cleans and transforms the Grammy Awards data and returns the DataFrame.
@@ -91,7 +138,7 @@ def transforming_grammys_data(df):
         
         df = df.rename(columns={"winner": "is_nominated"})
         
-        df = df.drop(columns=["published_at", "updated_at", "img"])
+        df = df.drop(columns=["published_at", "updated_at", "img"], errors="ignore")
         
         df = df.dropna(subset=["nominee"])
         
@@ -105,24 +152,7 @@ def transforming_grammys_data(df):
         
         df.loc[both_null_values.index, "artist"] = both_null_values["nominee"]
         
-        df["artist"] = df.apply(
-            lambda row: extract_artist(row["workers"]) if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
-        
-        df["artist"] = df.apply(move_workers_to_artist, axis=1)
-        
-        df["artist"] = df.apply(
-            lambda row: extract_artists_before_semicolon(row["workers"], roles_of_interest)
-            if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
-        
-        df["artist"] = df.apply(
-            lambda row: extract_roles_based_on_interest(row["workers"], roles_of_interest)
-            if pd.isna(row["artist"]) else row["artist"],
-            axis=1
-        )
+        df["artist"] = resolving_artists(df)
         
         df = df.dropna(subset=["artist"])
 
@@ -1,12 +1,20 @@
+import numpy as np
 import pandas as pd
 import logging
 
+from transform.fuzzy_matching import MIN_SCORE, matching_names
+from utils.normalization import normalizing_names
+from utils.instrumentation import measuring_stage
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
 
+def primer_nombre(serie):
+    # Extraer solo el primer artista si hay múltiples separados por coma, normalizado una vez por valor distinto
+    return normalizing_names(serie, separator=",")
+
 def limpiar_y_preparar_columna(df, columna_origen, columna_destino):
     if columna_origen in df.columns:
-        # Extraer solo el primer artista si hay múltiples separados por coma
-        df[columna_destino] = df[columna_origen].astype(str).str.split(',').str[0].str.lower().str.strip()
+        df[columna_destino] = primer_nombre(df[columna_origen])
         return True
     else:
         logging.error(f"La columna de origen '{columna_origen}' no existe en el DataFrame.")
@@ -27,7 +35,183 @@ def drop_columns(df, columns):
     else:
         logging.warning(f"Ninguna de las columnas especificadas para eliminar fue encontrada: {columns}")
 
-def merging_datasets(api_df: pd.DataFrame, spotify_df: pd.DataFrame, grammys_df: pd.DataFrame) -> pd.DataFrame:
+def una_fila_por_clave(df, clave, prioridad=None):
+    """
+    Deja una sola fila por valor de `clave`. Si se da `prioridad` ({columna: ascendente}),
+    se conserva la primera fila según ese orden; si no, la primera en el orden original.
+    
+    """
+    if prioridad:
+        df = df.sort_values(list(prioridad), ascending=list(prioridad.values()), kind="stable")
+    unicas = df.drop_duplicates(subset=[clave], keep="first")
+    duplicadas = df.shape[0] - unicas.shape[0]
+    if duplicadas:
+        logging.info(f"Se agregaron {duplicadas} filas con '{clave}' repetida en el lado derecho de la unión.")
+    return unicas
+
+def reportar_expansion(nombre, filas_entrada, filas_salida):
+    factor = filas_salida / filas_entrada if filas_entrada else float("nan")
+    logging.info(f"Unión '{nombre}': {filas_entrada} filas -> {filas_salida} filas (x{factor:.3f}).")
+    return {"union": nombre, "filas_entrada": filas_entrada, "filas_salida": filas_salida, "expansion": factor}
+
+def union_por_codigos(izquierda, derecha, clave_izquierda, clave_derecha, suffixes=("", "_right")):
+    """
+    Left join por hash sobre códigos enteros: las claves de ambos lados se factorizan
+    juntas y cada fila de la izquierda busca su fila derecha en un arreglo indexado
+    por código. Requiere que `derecha` tenga una sola fila por clave, así que la salida
+    tiene exactamente las filas de `izquierda`, en su orden.
+    
+    Devuelve lo mismo que DataFrame.merge(how="left") con esa `derecha`: las claves
+    nulas se emparejan entre sí, como en merge, y si ambos lados llaman igual a la
+    clave la salida tiene una sola columna con ella.
+    
+    """
+    if derecha[clave_derecha].duplicated().any():
+        raise ValueError(f"La columna '{clave_derecha}' tiene valores repetidos; usa una_fila_por_clave antes de unir.")
+    
+    izquierda = izquierda.reset_index(drop=True)
+    derecha = derecha.reset_index(drop=True)
+    
+    # Con use_na_sentinel=False los nulos tienen su propio código y se emparejan entre sí, como en merge.
+    claves = pd.concat([izquierda[clave_izquierda], derecha[clave_derecha]], ignore_index=True)
+    codigos, unicos = pd.factorize(claves, use_na_sentinel=False)
+    codigos_izquierda = codigos[:len(izquierda)]
+    codigos_derecha = codigos[len(izquierda):]
+    
+    # La última posición nunca corresponde a un código: es la fila vacía para las claves sin pareja.
+    posicion_por_codigo = np.full(len(unicos) + 1, len(derecha), dtype=np.int64)
+    posicion_por_codigo[codigos_derecha] = np.arange(len(derecha))
+    posiciones = posicion_por_codigo[codigos_izquierda]
+    
+    # reindex añade la fila vacía con las mismas conversiones de tipo que merge (int -> float, bool -> object),
+    # que merge solo hace cuando alguna fila queda sin pareja.
+    if (posiciones < len(derecha)).all():
+        filas_derecha = derecha.iloc[posiciones].reset_index(drop=True)
+    else:
+        filas_derecha = derecha.reindex(range(len(derecha) + 1)).iloc[posiciones].reset_index(drop=True)
+    if clave_izquierda == clave_derecha:
+        # merge deja una sola columna para una clave con el mismo nombre en ambos lados.
+        filas_derecha = filas_derecha.drop(columns=[clave_derecha])
+    
+    comunes = [col for col in filas_derecha.columns if col in izquierda.columns]
+    izquierda = izquierda.rename(columns={col: col + suffixes[0] for col in comunes})
+    filas_derecha = filas_derecha.rename(columns={col: col + suffixes[1] for col in comunes})
+    
+    return pd.concat([izquierda, filas_derecha], axis=1)
+
+def unir(izquierda, derecha, clave_izquierda, clave_derecha, nombre, join_mode, prioridad=None, suffixes=("", "_right")):
+    """
+    Left join de `izquierda` con `derecha` que reporta cuántas filas genera.
+    
+    join_mode:
+        "aggregate": reduce `derecha` a una fila por clave y une por códigos enteros;
+                     la salida tiene exactamente las filas de la izquierda.
+        "expand":    une con todas las filas de `derecha` (comportamiento anterior);
+                     una clave repetida multiplica las filas de la izquierda.
+    
+    """
+    if join_mode == "aggregate":
+        derecha = una_fila_por_clave(derecha, clave_derecha, prioridad)
+        resultado = union_por_codigos(izquierda, derecha, clave_izquierda, clave_derecha, suffixes)
+    elif join_mode == "expand":
+        resultado = izquierda.merge(derecha, how="left", left_on=clave_izquierda,
+                                    right_on=clave_derecha, suffixes=suffixes)
+    else:
+        raise ValueError(f"Modo de unión desconocido: {join_mode}. Usa 'aggregate' o 'expand'.")
+    
+    reportar_expansion(nombre, izquierda.shape[0], resultado.shape[0])
+    return resultado
+
+def expandir_artistas(artistas, separador=";"):
+    """
+    Índice expandido compacto de los artistas acreditados en cada canción.
+    
+    Devuelve (posiciones, codigos, nombres) con una entrada por artista y canción:
+    `posiciones` es la posición de la canción, `codigos` el índice del artista en
+    `nombres`, donde cada nombre limpio distinto aparece una sola vez (-1 si está vacío).
+    Las filas anchas nunca se copian y la limpieza se hace una vez por nombre distinto.
+    
+    """
+    separados = artistas.reset_index(drop=True).str.split(separador).explode()
+    posiciones = separados.index.to_numpy(dtype=np.int32)
+    
+    codigos_crudos, crudos = pd.factorize(separados, use_na_sentinel=True)
+    codigos_limpios, nombres = pd.factorize(primer_nombre(pd.Series(crudos)))
+    codigos = np.where(codigos_crudos >= 0, codigos_limpios[codigos_crudos], -1)
+    
+    return posiciones, codigos, nombres
+
+def unir_todos_los_artistas(artistas, api, clave_api, artist_match="exact", min_score=MIN_SCORE):
+    """
+    Une todos los artistas acreditados de cada canción (separados por ';') con la tabla
+    de la API, que debe tener una fila por `clave_api`, y reagrupa por canción.
+    
+    Devuelve un DataFrame alineado por posición con `artistas` con:
+        clave_api, country, type: los del primer artista acreditado que tenga pareja en
+                                  la API (el principal, si la tiene).
+        countries:                los países conocidos de todos los artistas emparejados,
+                                  ordenados y separados por ';'.
+    
+    """
+    api = api.reset_index(drop=True)
+    posiciones, codigos, nombres = expandir_artistas(artistas)
+    logging.info(f"Expansión de artistas: {len(artistas)} canciones -> {len(posiciones)} créditos "
+                 f"({len(nombres)} artistas distintos).")
+    
+    claves = pd.Series(nombres)
+    if artist_match == "fuzzy":
+        claves = matching_names(claves, api[clave_api], min_score)
+    
+    # Fila de la API de cada nombre distinto (-1 si no está); los créditos solo llevan el código.
+    # El -1 añadido al final es el de los créditos vacíos (código -1), aunque no haya ningún nombre.
+    fila_por_nombre = np.append(pd.Index(api[clave_api]).get_indexer(claves), -1)
+    filas = fila_por_nombre[codigos]
+    emparejados = filas >= 0
+    creditos = pd.DataFrame({"posicion": posiciones[emparejados], "fila": filas[emparejados]})
+    
+    # explode conserva el orden de los créditos, así que el primero por canción es el más cercano al principal.
+    primeros = creditos.drop_duplicates("posicion")
+    fila_por_cancion = np.full(len(artistas), len(api), dtype=np.int64)
+    fila_por_cancion[primeros["posicion"].to_numpy()] = primeros["fila"].to_numpy()
+    resultado = api.reindex(range(len(api) + 1))[[clave_api, "country", "type"]].iloc[fila_por_cancion].reset_index(drop=True)
+    
+    creditos["pais"] = api["country"].to_numpy()[creditos["fila"].to_numpy()]
+    paises = creditos[creditos["pais"].notna() & (creditos["pais"] != "Desconocido")]
+    paises = paises[["posicion", "pais"]].drop_duplicates().sort_values(["posicion", "pais"])
+    resultado["countries"] = paises.groupby("posicion")["pais"].agg(";".join).reindex(range(len(artistas))).fillna("Desconocido").to_numpy()
+    
+    return resultado
+
+@measuring_stage("merge")
+def merging_datasets(api_df: pd.DataFrame, spotify_df: pd.DataFrame, grammys_df: pd.DataFrame,
+                     join_mode: str = "aggregate", artist_match: str = "exact",
+                     min_score: float = MIN_SCORE, artists_mode: str = "primary") -> pd.DataFrame:
+    """
+    Une Spotify con Grammys (por nombre de canción) y con la API (por artista principal).
+    
+    Con join_mode="aggregate" (por defecto) cada lado derecho se reduce a una fila por
+    clave antes de unir, así que el resultado tiene una fila por canción de Spotify:
+    de los Grammys se conserva la nominación ganadora más reciente y de la API la fila
+    con país y tipo conocidos. Con join_mode="expand" se conservan todas las
+    coincidencias, como antes, y el reporte de expansión muestra cuántas filas se añaden.
+    
+    artist_match decide cómo se empareja el artista principal con la API:
+        "exact": la clave normalizada (utils.normalization.normalizing_name: sin acentos,
+                 comillas ni espacios repetidos, "&" como "and" y en minúsculas) tiene que
+                 ser idéntica. Empareja más que la comparación en minúsculas de antes:
+                 "Solña" y "Solna" tienen la misma clave.
+        "fuzzy": se normalizan acentos, "The", "&"/"and" y créditos "feat." y, si aun así
+                 no hay coincidencia, se busca el nombre más parecido (puntaje >= min_score)
+                 entre los candidatos de un índice de n-gramas, sin comparar contra toda la tabla.
+    
+    artists_mode decide qué artistas de la canción se buscan en la API:
+        "primary": solo el principal (comportamiento anterior).
+        "all":     todos los acreditados (separados por ';'). country y type son los del
+                   primer acreditado con pareja en la API y la columna countries reúne los
+                   países de todos. La API siempre se reduce a una fila por artista, así que
+                   el resultado conserva una fila por fila de la primera fusión.
+    
+    """
 
     logging.info("Iniciando la fusión de datasets.")
 
@@ -50,11 +234,14 @@ def merging_datasets(api_df: pd.DataFrame, spotify_df: pd.DataFrame, grammys_df:
              return pd.DataFrame()
 
         logging.info("Realizando primera fusión (Spotify y Grammys) por nombre de canción/nominado.")
-        df_merged_step1 = spotify_df_copy.merge(
+        df_merged_step1 = unir(
+            spotify_df_copy,
             grammys_df_copy,
-            how="left",
-            left_on="track_name_clean",
-            right_on="nominee_clean",
+            "track_name_clean",
+            "nominee_clean",
+            "spotify-grammys",
+            join_mode,
+            prioridad={"is_nominated": False, "year": False},
             suffixes=("", "_grammys")
         )
 
@@ -75,14 +262,38 @@ def merging_datasets(api_df: pd.DataFrame, spotify_df: pd.DataFrame, grammys_df:
              return pd.DataFrame()
 
 
+        if artist_match not in ("exact", "fuzzy"):
+            raise ValueError(f"Modo de emparejamiento de artistas desconocido: {artist_match}. Usa 'exact' o 'fuzzy'.")
+        if artists_mode not in ("primary", "all"):
+            raise ValueError(f"Modo de artistas desconocido: {artists_mode}. Usa 'primary' o 'all'.")
+
         logging.info("Realizando segunda fusión (Resultado anterior y API) por nombre de artista.")
-        df_merged_final = df_merged_step1.merge(
-            api_df_copy[['artist_api_clean', 'country', 'type']], # Seleccionar solo columnas necesarias de API
-            how="left",
-            left_on="artist_clean",
-            right_on="artist_api_clean",
-            suffixes=("", "_api")
-        )
+        api_df_copy["sin_pais"] = api_df_copy["country"].isna() | (api_df_copy["country"] == "Desconocido")
+        api_df_copy["sin_tipo"] = api_df_copy["type"].isna() | (api_df_copy["type"] == "Otro")
+        api_columnas = api_df_copy[['artist_api_clean', 'country', 'type', 'sin_pais', 'sin_tipo']] # Seleccionar solo columnas necesarias de API
+        prioridad_api = {"sin_pais": True, "sin_tipo": True}
+
+        if artists_mode == "all":
+            api_unica = una_fila_por_clave(api_columnas, "artist_api_clean", prioridad_api)
+            artistas_api = unir_todos_los_artistas(df_merged_step1["artists"], api_unica, "artist_api_clean",
+                                                   artist_match, min_score)
+            df_merged_final = pd.concat([df_merged_step1.reset_index(drop=True), artistas_api], axis=1)
+        else:
+            clave_artista = "artist_clean"
+            if artist_match == "fuzzy":
+                df_merged_step1["artist_match"] = matching_names(df_merged_step1["artist_clean"],
+                                                                 api_df_copy["artist_api_clean"], min_score)
+                clave_artista = "artist_match"
+            df_merged_final = unir(
+                df_merged_step1,
+                api_columnas,
+                clave_artista,
+                "artist_api_clean",
+                "spotify-api",
+                join_mode,
+                prioridad=prioridad_api,
+                suffixes=("", "_api")
+            )
 
 
         if 'country_api' in df_merged_final.columns:
@@ -95,7 +306,11 @@ def merging_datasets(api_df: pd.DataFrame, spotify_df: pd.DataFrame, grammys_df:
         fill_null_values(df_merged_final, fill_columns_api, "Desconocido")
 
 
-        columns_drop_final = ["artist_clean", "artist_api_clean", "artist"]
+        emparejadas = df_merged_final["artist_api_clean"].notna().sum()
+        logging.info(f"Artistas emparejados con la API ({artist_match}): {emparejadas} de {df_merged_final.shape[0]} filas "
+                     f"({emparejadas / max(df_merged_final.shape[0], 1):.1%}).")
+
+        columns_drop_final = ["artist_clean", "artist_match", "artist_api_clean", "artist", "sin_pais", "sin_tipo"]
         drop_columns(df_merged_final, columns_drop_final)
 
 
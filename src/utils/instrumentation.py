@@ -0,0 +1,272 @@
+import os
+import re
+import json
+import time
+import fcntl
+import logging
+import functools
+import threading
+import contextlib
+import contextvars
+from pathlib import Path
+from datetime import datetime, timezone
+
+import pandas as pd
+import psutil
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s", datefmt="%d/%m/%Y %I:%M:%S %p")
+
+metrics_dir = os.getenv("METRICS_DIR", "./data/metrics")
+
+SAMPLE_INTERVAL = 0.1
+METRIC_PREFIX = "workshop2_stage"
+DEFAULT_COUNTERS = ("http_requests", "db_calls")
+
+# (field, help) of the per-stage values exported as Prometheus gauges.
+gauges = [
+    ("wall_seconds", "Wall-clock time of the stage."),
+    ("cpu_seconds", "CPU time of the process during the stage."),
+    ("peak_rss_bytes", "Peak resident memory of the process, and of its pool workers, during the stage."),
+    ("rows_in", "Rows of the DataFrames the stage received."),
+    ("rows_out", "Rows of the DataFrame the stage returned."),
+    ("bytes_in", "In-memory size of the DataFrames the stage received."),
+    ("bytes_out", "In-memory size of the DataFrame the stage returned."),
+]
+
+_counters = {}
+_counters_lock = threading.Lock()
+# Counters of the stages open in the current context, innermost last. Each thread
+# starts with an empty context, so stages running concurrently in other threads
+# (the pipeline branches) never see each other's calls.
+_stage_counters = contextvars.ContextVar("stage_counters", default=())
+_process_run_id = f"local_{datetime.now():%Y%m%dT%H%M%S}_{os.getpid()}"
+# Process pools running in this process; the memory samplers only look for children meanwhile.
+_pools_running = 0
+
+
+def counting(name, amount=1):
+    """
+    Adds `amount` to the counter `name` (e.g. "http_requests", "db_calls") of the stages
+    open in the current context and to the process total. Work a stage hands to a
+    thread pool is counted for it only when submitted with contextvars.copy_context().run.
+
+    """
+    with _counters_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+        for counts in _stage_counters.get():
+            counts[name] = counts.get(name, 0) + amount
+
+
+def reading_counters():
+    """
+    Process totals of every counter, across all stages and threads.
+
+    """
+    with _counters_lock:
+        return dict(_counters)
+
+
+@contextlib.contextmanager
+def running_workers():
+    """
+    Marks a process pool as running, so the memory of its workers is added to the
+    peak of the stages open meanwhile. Listing the child processes means scanning
+    /proc, too costly to do on every sample when there are none.
+
+    """
+    global _pools_running
+    with _counters_lock:
+        _pools_running += 1
+    try:
+        yield
+    finally:
+        with _counters_lock:
+            _pools_running -= 1
+
+
+def getting_run_id():
+    """
+    Id of the current run: METRICS_RUN_ID, the Airflow DAG run id when running as a
+    task, or an id for the current process otherwise.
+
+    """
+    return os.getenv("METRICS_RUN_ID") or os.getenv("AIRFLOW_CTX_DAG_RUN_ID") or _process_run_id
+
+
+class PeakMemorySampler:
+    """
+    Samples the resident memory (RSS) of the process from a background thread and keeps
+    the highest value seen while the context is open. While a process pool runs
+    (see running_workers) the RSS of the child processes is added. Pages shared by
+    several processes count once per process, so the total is an upper bound.
+
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.process = psutil.Process()
+        self.interval = interval
+        self.start = self.peak = self._measuring()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sampling, daemon=True)
+
+    def _measuring(self):
+        rss = self.process.memory_info().rss
+        if not _pools_running:
+            return rss
+        for child in self.process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss
+
+    def _sampling(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self._measuring())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self._measuring())
+
+
+def _sizing(values):
+    frames = [value for value in values if isinstance(value, pd.DataFrame)]
+    if not frames:
+        return None, None
+    rows = sum(frame.shape[0] for frame in frames)
+    size = sum(frame.memory_usage(index=True, deep=True).sum() for frame in frames)
+    return int(rows), int(size)
+
+
+def _rendering_prometheus(records):
+    # A stage retried within the same run keeps only its last record, so label sets stay unique.
+    latest = {record["stage"]: record for record in records}
+    lines = []
+
+    for field, description in gauges:
+        name = f"{METRIC_PREFIX}_{field}"
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+        for record in latest.values():
+            if record.get(field) is not None:
+                lines.append(f'{name}{{run_id="{record["run_id"]}",stage="{record["stage"]}"}} {record[field]}')
+
+    name = f"{METRIC_PREFIX}_calls"
+    lines += [f"# HELP {name} Calls made during the stage, by kind.", f"# TYPE {name} gauge"]
+    for record in latest.values():
+        for kind, value in record["counters"].items():
+            lines.append(f'{name}{{run_id="{record["run_id"]}",stage="{record["stage"]}",kind="{kind}"}} {value}')
+
+    name = f"{METRIC_PREFIX}_success"
+    lines += [f"# HELP {name} 1 if the stage finished without raising.", f"# TYPE {name} gauge"]
+    for record in latest.values():
+        lines.append(f'{name}{{run_id="{record["run_id"]}",stage="{record["stage"]}"}} {int(record["status"] == "ok")}')
+
+    return "\n".join(lines) + "\n"
+
+
+def _replacing(path, text):
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
+
+
+def writing_report(record):
+    """
+    Appends `record` to the run's stages.jsonl and rewrites report.json and metrics.prom
+    (Prometheus text format) from every stage recorded so far in that run.
+
+    Stages of the same run may run in different processes (one per Airflow task), so
+    the update happens under an exclusive lock on stages.jsonl.
+
+    """
+    run_dir = Path(metrics_dir) / re.sub(r"[^A-Za-z0-9_.-]", "_", record["run_id"])
+    run_dir.mkdir(parents=True, exist_ok=True)
+
+    with open(run_dir / "stages.jsonl", "a+", encoding="utf-8") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        f.write(json.dumps(record) + "\n")
+        f.flush()
+        f.seek(0)
+        records = [json.loads(line) for line in f if line.strip()]
+
+        report = {
+            "run_id": record["run_id"],
+            "stages": records,
+            "totals": {
+                "wall_seconds": sum(r["wall_seconds"] for r in records),
+                "cpu_seconds": sum(r["cpu_seconds"] for r in records),
+                "peak_rss_bytes": max(r["peak_rss_bytes"] for r in records),
+            },
+        }
+        _replacing(run_dir / "report.json", json.dumps(report, indent=2))
+        _replacing(run_dir / "metrics.prom", _rendering_prometheus(records))
+
+
+def measuring_stage(stage):
+    """
+    Decorator that measures every call of a pipeline stage: wall and CPU time, peak
+    RSS, rows and in-memory bytes of the DataFrames in and out, and the HTTP/DB calls
+    the stage made (see counting). The record is logged and, unless METRICS_DIR is empty, added to
+    the run report in METRICS_DIR/<run id>/. Failures to write the report never fail the stage.
+
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            rows_in, bytes_in = _sizing(list(args) + list(kwargs.values()))
+            counts = {}
+            token = _stage_counters.set(_stage_counters.get() + (counts,))
+            started_at = datetime.now(timezone.utc).isoformat()
+            wall_start, cpu_start = time.perf_counter(), time.process_time()
+            result, error = None, None
+
+            memory = PeakMemorySampler()
+            try:
+                with memory:
+                    result = function(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = e
+                raise
+            finally:
+                wall = time.perf_counter() - wall_start
+                cpu = time.process_time() - cpu_start
+                _stage_counters.reset(token)
+                with _counters_lock:
+                    counters = {name: counts.get(name, 0) for name in sorted(set(DEFAULT_COUNTERS) | set(counts))}
+                rows_out, bytes_out = _sizing([result])
+
+                record = {
+                    "run_id": getting_run_id(),
+                    "stage": stage,
+                    "function": f"{function.__module__}.{function.__qualname__}",
+                    "started_at": started_at,
+                    "status": "error" if error else "ok",
+                    "error": repr(error) if error else None,
+                    "wall_seconds": round(wall, 4),
+                    "cpu_seconds": round(cpu, 4),
+                    "rss_start_bytes": memory.start,
+                    "peak_rss_bytes": memory.peak,
+                    "rows_in": rows_in,
+                    "rows_out": rows_out,
+                    "bytes_in": bytes_in,
+                    "bytes_out": bytes_out,
+                    "counters": counters,
+                }
+
+                logging.info(f"Stage {stage}: {wall:.2f} s wall, {cpu:.2f} s CPU, peak RSS {memory.peak / 2**20:.0f} MiB, "
+                             f"rows {rows_in} -> {rows_out}, calls {counters}.")
+
+                if metrics_dir:
+                    try:
+                        writing_report(record)
+                    except Exception as e:
+                        logging.warning(f"Could not write the metrics of stage {stage}: {e}")
+
+        return wrapper
+    return decorator
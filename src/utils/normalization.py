@@ -0,0 +1,93 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+# Bump when the key form or the search form changes, so stores keyed by the first
+# and filled with the answers to the second know they must be rebuilt.
+NORMALIZATION_VERSION = "2"
+CACHE_SIZE = 2 ** 18
+
+# The search form is the one sent to MusicBrainz, so it keeps the replacements of the
+# original extractor exactly: "Simon&Garfunkel" is still queried as "SimonandGarfunkel".
+search_table = str.maketrans({
+    "\\": "",
+    '"': "",
+    "'": "",
+    "/": " ",
+    "&": "and",
+})
+translation_table = str.maketrans({
+    "\\": "",
+    '"': "",
+    "'": "",
+    "/": " ",
+    "&": " and ",
+})
+whitespace_pattern = re.compile(r"\s+")
+
+
+def _is_blank(name) -> bool:
+    return not isinstance(name, str) or not name.strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def cleaning_name(name):
+    """
+    Search form of a name, the one queried: quotes and backslashes removed, "/" as
+    a space and "&" as "and", with no spaces added or collapsed. Case and accents
+    are kept. Blank or missing names give None.
+
+    """
+    if _is_blank(name):
+        return None
+    return name.translate(search_table).strip() or None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def normalizing_name(name):
+    """
+    Key form of a name, the one every stage joins and caches on: after Unicode NFKD
+    decomposition, without accents, quotes and backslashes, with "/" as a space,
+    "&" as " and ", whitespace collapsed and casefolded.
+
+    """
+    if _is_blank(name):
+        return None
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(char for char in name if not unicodedata.combining(char))
+    name = whitespace_pattern.sub(" ", name.translate(translation_table)).strip()
+    return name.casefold() or None
+
+
+def _per_distinct(series: pd.Series, function, separator=None) -> pd.Series:
+    # Each distinct value goes through `function` once; rows only carry its integer code.
+    codes, uniques = pd.factorize(series, use_na_sentinel=True)
+    values = pd.Series(uniques, dtype=object)
+    if separator is not None:
+        values = values.astype(str).str.split(separator, regex=False).str[0]
+    results = values.map(function).to_numpy(dtype=object)
+    # None for the missing rows too, as `function` returns for blank names.
+    out = np.full(len(series), None, dtype=object)
+    known = codes >= 0
+    out[known] = results[codes[known]]
+    return pd.Series(out, index=series.index)
+
+
+def cleaning_names(series: pd.Series) -> pd.Series:
+    """
+    cleaning_name over a Series, computed once per distinct value.
+
+    """
+    return _per_distinct(series, cleaning_name)
+
+
+def normalizing_names(series: pd.Series, separator=None) -> pd.Series:
+    """
+    normalizing_name over a Series, computed once per distinct value. With
+    `separator`, only the text before its first occurrence is normalized.
+
+    """
+    return _per_distinct(series, normalizing_name, separator)
@@ -0,0 +1,13 @@
+"""
+The modules under src/ import each other as top-level packages (as in the DAG), and
+the stand-ins live in benchmarks/ at the repository root, so both go on sys.path.
+
+"""
+from pathlib import Path
+import sys
+
+ROOT = Path(__file__).resolve().parents[1]
+
+for path in (ROOT, ROOT / "src"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
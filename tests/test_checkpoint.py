@@ -0,0 +1,81 @@
+"""
+ExtractionCheckpoint: a checkpoint reloaded after a crash resumes from the same
+pages, rows and completed batches the interrupted run had saved.
+
+"""
+import json
+
+from extract.checkpoint import ExtractionCheckpoint
+
+PLAN = [["Artist A", "Artist B"], ["Artist C"], ["Artist D"]]
+
+
+def _saving_progress(path):
+    checkpoint = ExtractionCheckpoint(path, "key")
+    checkpoint.start(PLAN)
+    checkpoint.save_page(0, 0, [{"name": "Artist A"}])
+    checkpoint.save_page(1, 0, [{"name": "Artist C"}], last=True)
+    checkpoint.save_page(0, 1, [{"name": "Artist B"}], last=True)
+    checkpoint.save_page(2, 0, [])
+    return checkpoint
+
+
+def _state(checkpoint):
+    return checkpoint.plan, checkpoint.pages, checkpoint.rows, checkpoint.completed
+
+
+def test_resume_replays_saved_progress(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    interrupted = _saving_progress(path)
+    interrupted.close()
+
+    resumed = ExtractionCheckpoint(path, "key")
+    assert resumed.load()
+    assert _state(resumed) == _state(interrupted)
+    assert resumed.completed == {0, 1}
+
+
+def test_resume_ignores_a_torn_last_line(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    interrupted = _saving_progress(path)
+    interrupted.close()
+    expected = _state(interrupted)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"batch": 2, "page": 1, "ro')
+
+    resumed = ExtractionCheckpoint(path, "key")
+    assert resumed.load()
+    assert _state(resumed) == expected
+
+    # New events go after the last complete line, so a second resume sees them.
+    resumed.save_page(2, 1, [{"name": "Artist D"}], last=True)
+    resumed.close()
+    again = ExtractionCheckpoint(path, "key")
+    assert again.load()
+    assert again.completed == {0, 1, 2}
+    assert again.rows[2] == [{"name": "Artist D"}]
+
+
+def test_resume_reads_batches_completed_in_their_own_line(tmp_path):
+    # Checkpoints written before the last page carried the completion.
+    path = tmp_path / "checkpoint.jsonl"
+    events = [{"key": "key", "plan": PLAN},
+              {"batch": 0, "page": 0, "rows": [{"name": "Artist A"}]},
+              {"batch": 0, "completed": True}]
+    path.write_text("".join(json.dumps(event) + "\n" for event in events), encoding="utf-8")
+
+    resumed = ExtractionCheckpoint(path, "key")
+    assert resumed.load()
+    assert resumed.pages == {0: 0}
+    assert resumed.rows == {0: [{"name": "Artist A"}]}
+    assert resumed.completed == {0}
+
+
+def test_other_extraction_or_empty_file_starts_from_scratch(tmp_path):
+    path = tmp_path / "checkpoint.jsonl"
+    _saving_progress(path).close()
+    assert not ExtractionCheckpoint(path, "other key").load()
+
+    path.write_text("", encoding="utf-8")
+    assert not ExtractionCheckpoint(path, "key").load()
+    assert not ExtractionCheckpoint(tmp_path / "missing.jsonl", "key").load()
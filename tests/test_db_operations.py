@@ -0,0 +1,106 @@
+"""
+The COPY and upsert loads against the row-wise writes they replaced: DataFrame.to_sql
+for copying_dataframe, and one UPDATE or INSERT per row for upserting_dataframe.
+
+Needs Postgres: TEST_DATABASE_URL, or a throwaway server from pgserver when it is
+installed. Skipped otherwise.
+
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from db.db_operations import getting_engine, disposing_engine, borrowing_raw_connection, load_clean_data
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    url = os.getenv("TEST_DATABASE_URL")
+    server = None
+    if not url:
+        pgserver = pytest.importorskip("pgserver")
+        server = pgserver.get_server(tmp_path_factory.mktemp("pgdata"))
+        url = server.get_uri("workshop_2_test")
+    engine = getting_engine(url)
+    yield engine
+    disposing_engine(engine)
+    if server is not None:
+        server.cleanup()
+
+
+NAMES = ["Plain", "", "Comma, and \"quotes\"", "Line\r\nbreak\tand tab", "\\N", None, "Back\\slash", "t"]
+
+
+def _frame(ids, index=None):
+    n = len(ids)
+    return pd.DataFrame({
+        "id": ids,
+        "track_name": (NAMES * n)[:n],
+        "popularity": pd.array(([50, None, 0, 100, 7, 3] * n)[:n], dtype="Int64"),
+        "valence": ([0.5, np.nan, 0.0, 1.0, 0.25, 0.75] * n)[:n],
+        "missing": [np.nan] * n,
+        "explicit": ([True, False, True, False, True, False] * n)[:n],
+    }, index=index)
+
+
+def _reading(engine, table_name):
+    return pd.read_sql(f'SELECT * FROM "{table_name}" ORDER BY id', engine)
+
+
+def _creating(engine, table_name, df, mode="create", key=None):
+    # load_clean_data on an empty frame only creates the table with the inferred types.
+    load_clean_data(engine, df.iloc[:0], table_name, mode=mode, key=key)
+
+
+@pytest.mark.parametrize("ids, index", [
+    (list(range(8)), None),
+    (list(range(8)), [1, 1, 0, 0, 2, 2, 3, 3]),
+    ([], None),
+])
+def test_copy_loads_what_to_sql_loads(engine, ids, index):
+    df = _frame(ids, index)
+    table_name = f"copy_{len(ids)}_{index is not None}"
+
+    _creating(engine, f"{table_name}_expected", df)
+    df.to_sql(f"{table_name}_expected", con=engine, if_exists="append", index=False)
+    load_clean_data(engine, df, table_name, chunksize=4)
+
+    loaded = _reading(engine, table_name)
+    assert len(loaded) == len(df)
+    pd.testing.assert_frame_equal(loaded, _reading(engine, f"{table_name}_expected"))
+
+
+def _upserting_row_by_row(engine, df, table_name, key):
+    columns = list(df.columns)
+    with borrowing_raw_connection(engine) as connection:
+        with connection.cursor() as cursor:
+            for row in df.astype(object).where(df.notna(), None).itertuples(index=False):
+                values = dict(zip(columns, row))
+                cursor.execute(
+                    f'UPDATE "{table_name}" SET ' + ", ".join(f'"{name}" = %({name})s' for name in columns if name not in key)
+                    + " WHERE " + " AND ".join(f'"{name}" = %({name})s' for name in key), values)
+                if cursor.rowcount == 0:
+                    cursor.execute(f'INSERT INTO "{table_name}" ({", ".join(columns)}) '
+                                   f'VALUES ({", ".join(f"%({name})s" for name in columns)})', values)
+
+
+@pytest.mark.parametrize("ids, index", [
+    ([3, 4, 5, 6, 7, 8], None),
+    ([8, 7, 6, 5, 4, 3], ["a"] * 6),
+    ([], None),
+])
+def test_upsert_matches_row_by_row_updates(engine, ids, index):
+    existing = _frame(list(range(8)))
+    df = _frame(ids, index)
+    df["track_name"] = df["track_name"].where(df["id"] % 2 == 0, "Updated")
+    table_name = f"upsert_{len(ids)}_{index is not None}"
+
+    for name in (table_name, f"{table_name}_expected"):
+        _creating(engine, name, existing, mode="upsert", key=["id"])
+        load_clean_data(engine, existing, name, mode="upsert", key=["id"])
+    _upserting_row_by_row(engine, df, f"{table_name}_expected", ["id"])
+    load_clean_data(engine, df, table_name, mode="upsert", key=["id"], chunksize=4)
+
+    pd.testing.assert_frame_equal(_reading(engine, table_name), _reading(engine, f"{table_name}_expected"))
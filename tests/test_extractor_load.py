@@ -0,0 +1,33 @@
+"""
+Runs the MusicBrainz extractor load test (benchmarks/extractor_load.py) against the
+local stand-in server, with injected errors and a second pass answered from the cache.
+
+"""
+from pathlib import Path
+import subprocess
+import json
+import sys
+import os
+
+ROOT = Path(__file__).resolve().parents[1]
+PRODUCTION_RATE_LIMIT = ROOT / "data" / "musicbrainz_rate_limit.bin"
+
+
+def test_extractor_load(tmp_path):
+    before = PRODUCTION_RATE_LIMIT.stat().st_mtime_ns if PRODUCTION_RATE_LIMIT.exists() else None
+    report_path = tmp_path / "report.json"
+
+    # A separate process: the extractor reads its configuration when it is imported.
+    subprocess.run([sys.executable, "-m", "benchmarks.extractor_load", "--artists", "300", "--miss-rate", "0.1",
+                    "--rps", "200", "--workers", "1", "--error-rate", "0.45", "--cache", "--passes", "2",
+                    "--json", str(report_path)],
+                   cwd=ROOT, env={**os.environ, "METRICS_DIR": ""}, check=True, timeout=300)
+
+    first, second = json.loads(report_path.read_text())["passes"]
+    assert first["resolved"] == 270
+    assert first["server"].get("error", 0) > 0 and first["retries"] > 0
+    assert second["resolved"] == first["resolved"] and second["rows"] == first["rows"]
+    assert second["client_requests"] == 0
+
+    after = PRODUCTION_RATE_LIMIT.stat().st_mtime_ns if PRODUCTION_RATE_LIMIT.exists() else None
+    assert after == before
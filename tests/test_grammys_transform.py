@@ -0,0 +1,81 @@
+"""
+resolving_artists against the row-wise df.apply chain it replaced.
+
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from transform.grammys_transform import (resolving_artists, extract_artist, move_workers_to_artist,
+                                         extract_artists_before_semicolon, extract_roles_based_on_interest,
+                                         roles_of_interest)
+
+GRAMMYS_PATH = Path(__file__).resolve().parents[1] / "data" / "the_grammy_awards (1).csv"
+
+WORKERS = [
+    "Bob Ludwig, mastering engineer (The Beatles)",
+    "Norah Jones",
+    "John Smith; Jane Doe, producer",
+    "Jane Doe, producer; John Smith",
+    "Leonard Bernstein, conductor; New York Philharmonic, ensembles",
+    "Robert Shaw, Chorus Master; Atlanta Symphony",
+    "Some Composer stuff; Someone",
+    "Anne, graphic designer",
+    "a, b, c",
+    "",
+    "(Various Artists)",
+    np.nan,
+]
+
+
+def _resolving_row_by_row(df):
+    # The four df.apply passes of the original transform, in order.
+    artists = []
+    for artist, workers in zip(df["artist"], df["workers"]):
+        if pd.isna(artist):
+            artist = extract_artist(workers)
+        artist = move_workers_to_artist({"artist": artist, "workers": workers})
+        if pd.isna(artist):
+            artist = extract_artists_before_semicolon(workers, roles_of_interest)
+        if pd.isna(artist):
+            artist = extract_roles_based_on_interest(workers, roles_of_interest)
+        artists.append(artist)
+    return pd.Series(artists, index=df.index, name="artist", dtype=object)
+
+
+def _missing_as_none(series):
+    return series.astype(object).where(series.notna(), None)
+
+
+def _checking(df):
+    pd.testing.assert_series_equal(_missing_as_none(resolving_artists(df)), _missing_as_none(_resolving_row_by_row(df)))
+
+
+def test_every_rule():
+    df = pd.DataFrame({"artist": [np.nan] * len(WORKERS), "workers": WORKERS})
+    _checking(df)
+
+
+def test_known_artists_are_kept():
+    df = pd.DataFrame({"artist": ["Adele", np.nan, None, "Taylor Swift"],
+                       "workers": ["Someone Else", "Norah Jones", np.nan, np.nan]})
+    _checking(df)
+
+
+@pytest.mark.parametrize("index", [[3, 3, 1, 1, 0, 0, 7, 7, 2, 2, 5, 5], ["a"] * 12])
+def test_repeated_labels(index):
+    artist = [np.nan, "Kept"] * 6
+    df = pd.DataFrame({"artist": artist, "workers": WORKERS}, index=index)
+    _checking(df)
+
+
+def test_empty_and_all_missing_frames():
+    _checking(pd.DataFrame({"artist": pd.Series([], dtype=object), "workers": pd.Series([], dtype=object)}))
+    _checking(pd.DataFrame({"artist": [np.nan] * 3, "workers": [np.nan] * 3}))
+
+
+@pytest.mark.skipif(not GRAMMYS_PATH.exists(), reason="Grammys dataset not in data/")
+def test_grammys_dataset():
+    _checking(pd.read_csv(GRAMMYS_PATH))
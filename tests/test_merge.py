@@ -0,0 +1,62 @@
+"""
+union_por_codigos against the DataFrame.merge(how="left") it replaced.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from transform.merge import union_por_codigos
+
+
+def _izquierda(index=None):
+    return pd.DataFrame({
+        "artist": ["adele", "queen", np.nan, "adele", "unknown", None, "queen"],
+        "track": ["a", "b", "c", "d", "e", "f", "g"],
+        "score": [1, 2, 3, 4, 5, 6, 7],
+    }, index=index)
+
+
+def _derecha():
+    return pd.DataFrame({
+        "name": ["queen", "adele", np.nan, "beatles"],
+        "score": [10, 20, 30, 40],
+        "active": [True, False, True, True],
+        "country": ["GB", "GB", None, "GB"],
+    })
+
+
+def _checking(izquierda, derecha, clave_izquierda, clave_derecha):
+    esperado = izquierda.merge(derecha, how="left", left_on=clave_izquierda, right_on=clave_derecha,
+                               suffixes=("", "_right"))
+    pd.testing.assert_frame_equal(union_por_codigos(izquierda, derecha, clave_izquierda, clave_derecha), esperado)
+
+
+@pytest.mark.parametrize("index", [None, [3, 3, 1, 1, 0, 0, 9], ["x"] * 7])
+def test_different_key_names(index):
+    _checking(_izquierda(index), _derecha(), "artist", "name")
+
+
+def test_same_key_name():
+    _checking(_izquierda(), _derecha().rename(columns={"name": "artist"}), "artist", "artist")
+
+
+def test_every_row_matched():
+    _checking(_izquierda().iloc[[0, 1, 3, 6]], _derecha(), "artist", "name")
+
+
+def test_empty_sides():
+    _checking(_izquierda().iloc[:0], _derecha(), "artist", "name")
+    _checking(_izquierda(), _derecha().iloc[:0], "artist", "name")
+    _checking(_izquierda().iloc[:0], _derecha().iloc[:0], "artist", "name")
+
+
+def test_all_missing_keys():
+    izquierda = _izquierda().assign(artist=pd.Series([None] * 7, dtype=object))
+    _checking(izquierda, _derecha(), "artist", "name")
+    _checking(izquierda, _derecha().iloc[[0, 1, 3]], "artist", "name")
+
+
+def test_repeated_right_keys_are_rejected():
+    with pytest.raises(ValueError):
+        union_por_codigos(_izquierda(), pd.concat([_derecha(), _derecha()]), "artist", "name")
@@ -0,0 +1,50 @@
+"""
+The per-distinct-value Series forms of the name normalization against calling the
+scalar functions on every row.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.normalization import cleaning_name, cleaning_names, normalizing_name, normalizing_names
+
+NAMES = ["Beyoncé", "beyonce", "Simon & Garfunkel", "Simon&Garfunkel", "AC/DC", "  Guns N' Roses ",
+         'The "Band"', "Back\\slash", "Sigur Rós; Jónsi", "Queen,David Bowie", "", "   ", np.nan, None, 42,
+         "Beyoncé"]
+
+
+def _row_by_row(series, function, separator=None):
+    def applying(value):
+        if pd.isna(value):
+            return None
+        if separator is not None:
+            value = str(value).split(separator)[0]
+        return function(value)
+    return pd.Series([applying(value) for value in series], index=series.index, dtype=object)
+
+
+@pytest.mark.parametrize("index", [None, [0] * len(NAMES)])
+@pytest.mark.parametrize("separator", [None, ";", ","])
+def test_normalizing_names(index, separator):
+    series = pd.Series(NAMES, index=index, dtype=object)
+    pd.testing.assert_series_equal(normalizing_names(series, separator), _row_by_row(series, normalizing_name, separator))
+
+
+@pytest.mark.parametrize("index", [None, [0] * len(NAMES)])
+def test_cleaning_names(index):
+    series = pd.Series(NAMES, index=index, dtype=object)
+    pd.testing.assert_series_equal(cleaning_names(series), _row_by_row(series, cleaning_name))
+
+
+@pytest.mark.parametrize("series", [pd.Series([], dtype=object), pd.Series([np.nan] * 3), pd.Series([None] * 3, index=[2, 2, 1])])
+def test_empty_and_all_missing(series):
+    pd.testing.assert_series_equal(normalizing_names(series, ";"), _row_by_row(series, normalizing_name, ";"))
+    pd.testing.assert_series_equal(cleaning_names(series), _row_by_row(series, cleaning_name))
+
+
+def test_keys_and_search_forms():
+    assert normalizing_name("Simon & Garfunkel") == normalizing_name("Simon&Garfunkel") == "simon and garfunkel"
+    assert normalizing_name("Beyoncé") == normalizing_name("BEYONCE") == "beyonce"
+    assert cleaning_name("Simon&Garfunkel") == "SimonandGarfunkel"
+    assert normalizing_name("   ") is None and cleaning_name(None) is None
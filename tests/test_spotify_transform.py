@@ -0,0 +1,144 @@
+"""
+The vectorized steps of the Spotify transform against the row-wise code they replaced.
+
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.generators import generating_spotify
+from transform.spotify_transform import bucketing, deduplicating_tracks, genre_category_mapping, _combining
+
+
+def categorize_duration(duration_ms):
+    if duration_ms < 150000:
+        return "Short"
+    elif 150000 <= duration_ms <= 300000:
+        return "Average"
+    else:
+        return "Long"
+
+
+def categorize_popularity(popularity):
+    if popularity <= 30:
+        return "Low Popularity"
+    elif 31 <= popularity <= 70:
+        return "Average Popularity"
+    else:
+        return "High Popularity"
+
+
+def determine_mood(valence):
+    if valence <= 0.3:
+        return "Sad"
+    elif 0.31 <= valence <= 0.6:
+        return "Neutral"
+    else:
+        return "Happy"
+
+
+# column: (source, original per-row function, values on and around every boundary)
+BUCKETS = {
+    "duration_category": ("duration_ms", categorize_duration, [0, 149999, 150000, 200000, 300000, 300001, 1e7]),
+    "popularity_category": ("popularity", categorize_popularity, [0, 30, 30.5, 31, 50, 70, 70.5, 71, 100]),
+    "track_mood": ("valence", determine_mood, [0.0, 0.3, 0.305, 0.31, 0.45, 0.6, 0.6001, 1.0]),
+}
+
+
+def _checking_buckets(column, series):
+    _, categorize, _ = BUCKETS[column]
+    result = bucketing(series, column)
+    expected = series.apply(categorize).astype(object) if len(series) else pd.Series([], dtype=object, index=series.index)
+    pd.testing.assert_series_equal(result.astype(object), expected, check_names=False)
+    assert result.name == column
+
+
+@pytest.mark.parametrize("column", BUCKETS)
+def test_bucketing_boundaries(column):
+    _, _, values = BUCKETS[column]
+    _checking_buckets(column, pd.Series(values + [np.nan]))
+
+
+@pytest.mark.parametrize("column", BUCKETS)
+def test_bucketing_integer_and_repeated_labels(column):
+    _, _, values = BUCKETS[column]
+    integers = pd.Series(np.round(values).astype(np.int64), index=[0] * len(values))
+    _checking_buckets(column, integers)
+
+
+@pytest.mark.parametrize("column", BUCKETS)
+def test_bucketing_empty_and_all_missing(column):
+    _checking_buckets(column, pd.Series([], dtype="float64"))
+    _checking_buckets(column, pd.Series([np.nan] * 3, index=[5, 5, 2]))
+
+
+def _deduplicating_like_before(df):
+    # The chain of dropna/drop_duplicates/sort_values/groupby of the original transform.
+    df = df.dropna().reset_index(drop=True).drop_duplicates()
+    df = df.drop_duplicates(subset=["track_id"]).reset_index(drop=True)
+    df["track_genre"] = df["track_genre"].map(genre_category_mapping)
+    df = df.drop_duplicates(subset=[column for column in df.columns if column not in ["track_id", "album_name"]])
+    return (df
+            .sort_values(by="popularity", ascending=False)
+            .groupby(["track_name", "artists"])
+            .head(1)
+            .sort_index()
+            .reset_index(drop=True))
+
+
+def _checking_deduplication(df):
+    result = df.take(deduplicating_tracks(df)).reset_index(drop=True)
+    result["track_genre"] = result["track_genre"].map(genre_category_mapping)
+    pd.testing.assert_frame_equal(result, _deduplicating_like_before(df))
+
+
+def _tracks(index=None):
+    return pd.DataFrame({
+        "track_id": ["t1", "t2", "t3", "t1", "t4", "t5", "t6", "t7", "t8", "t9", "t10", "t11"],
+        "artists": ["A", "A", "B", "A", "B", "C", "C", "C", np.nan, "D", "D", "D"],
+        "album_name": ["x", "y", "z", "x", "w", "v", "u", "u", "s", "r", "q", "p"],
+        "track_name": ["Song", "Song", "Other", "Song", "Other", "Tie", "Tie", "Tie", "Lost", "Same", "Same", "Same"],
+        "popularity": [40, 60, 10, 40, 10, 50, 50, 50, 99, 20, 20, 30],
+        "duration_ms": [1000, 1000, 2000, 1000, 2000, 3000, 3100, 3200, 4000, 5000, 5000, 5000],
+        # "metal" and "rock" are both Rock/Metal, so t10 repeats t9 once the genre is mapped.
+        "track_genre": ["pop", "pop", "jazz", "pop", "jazz", "edm", "edm", "house", "pop", "metal", "rock", "rock"],
+    }, index=index)
+
+
+@pytest.mark.parametrize("index", [None, [0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5], ["a"] * 12])
+def test_deduplication_rules(index):
+    _checking_deduplication(_tracks(index))
+
+
+def test_deduplication_with_missing_popularity():
+    df = _tracks()
+    df.loc[[2, 6], "popularity"] = np.nan
+    _checking_deduplication(df)
+
+
+def test_deduplication_of_empty_and_all_missing_frames():
+    _checking_deduplication(_tracks().iloc[:0])
+    _checking_deduplication(_tracks().assign(artists=np.nan))
+    _checking_deduplication(pd.DataFrame(np.nan, index=range(4), columns=_tracks().columns))
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_deduplication_of_generated_tracks(seed):
+    # Thousands of repeated tracks and popularity ties, with missing values spread over every column.
+    df = generating_spotify(0.05, seed=seed)
+    rng = np.random.default_rng(seed)
+    for column in df.columns:
+        df[column] = df[column].mask(rng.random(len(df)) < 0.002)
+    _checking_deduplication(df)
+
+
+def test_combining_keys_equal_exactly_when_codes_are():
+    rng = np.random.default_rng(0)
+    # Six columns of about 2**12 codes each overflow 2**62, so the key is renumbered on the way.
+    codes = [rng.integers(-1, cardinality, 5000) for cardinality in [4000, 4000, 4000, 4000, 4000, 3]]
+    codes = [np.concatenate([column, column[:500]]) for column in codes]
+
+    keys = _combining(codes)
+    rows = pd.MultiIndex.from_arrays(codes)
+    assert (pd.factorize(keys)[0] == pd.factorize(rows)[0]).all()
+    assert len(_combining([np.array([], dtype=np.int64)])) == 0